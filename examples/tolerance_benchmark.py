@@ -0,0 +1,81 @@
+"""
+Speed gained vs area error of the `tolerance` parameter on the bundled test
+data: the japan_urban.shp polygons, and DUC-like clouds (vertex heavy, ragged
+outlines) over the Oahu search results.
+"""
+import sensortools.tools.spatial as spatial_tools
+import sensortools.gbdxaoi as gbdxaoi
+from shapely.geometry import Polygon, mapping, shape
+import shapely.wkt
+import pandas as pd
+import numpy as np
+import fiona
+import time
+import os
+
+data_dir = os.path.abspath(os.path.join('./data'))
+tolerances = [None, 1., 5., 10., 25., 50.]
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        best = min(best, time.time() - start)
+    return best, result
+
+
+# Areas of the japan_urban polygons
+with fiona.open(os.path.join(data_dir, 'japan_urban.shp')) as src:
+    urban = [shape(feature['geometry']).wkt for feature in src]
+
+print('japan_urban.shp: {} polygons, {} vertices'.format(
+    len(urban), sum(len(shapely.wkt.loads(aoi).exterior.coords) for aoi in urban)))
+base_seconds, base = timed(lambda: np.array([spatial_tools.aoiArea(aoi) for aoi in urban]))
+for tolerance in tolerances[1:]:
+    seconds, areas = timed(lambda: np.array([spatial_tools.aoiArea(aoi, tolerance=tolerance) for aoi in urban]))
+    bound = np.array([spatial_tools.simplifyGeometry(shapely.wkt.loads(aoi), tolerance)[1]
+                      for aoi in urban])
+    print('tolerance {:>5.0f} m: {:.3f}s vs {:.3f}s ({:.1f}x), max area error {:.4f}% (bound {:.4f}%)'.format(
+        tolerance, seconds, base_seconds, base_seconds / seconds,
+        np.max(np.abs(areas - base) / base) * 100., np.max(bound / base) * 100.))
+
+
+# AOI cloud cover with vertex heavy clouds
+df = pd.read_csv(os.path.join(data_dir, 'gbdxsearch_formatted.csv'))
+aoi = spatial_tools.AOI('POLYGON ((-158.22 21.27, -157.8 21.27, -157.8 21.73, -158.22 21.73, -158.22 21.27))')
+rng = np.random.RandomState(0)
+
+
+def ragged_cloud(x, y, radius, step=0.0003, n=20000):
+    """
+    Cloud mask outline as DUC returns it: a ragged blob traced along the
+    edges of ~30 m pixels, so it has a vertex at every pixel corner
+    """
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = radius * (1 + 0.2 * np.sin(7 * angles) + 0.05 * np.sin(53 * angles + rng.uniform(0, 6)))
+    px = np.round((x + r * np.cos(angles)) / step) * step
+    py = np.round((y + r * np.sin(angles)) / step) * step
+    # stair step between consecutive pixel corners
+    xs = np.column_stack([px, px]).ravel()[1:]
+    ys = np.column_stack([py, np.roll(py, -1)]).ravel()[:-1]
+    keep = np.concatenate([[True], (np.diff(xs) != 0) | (np.diff(ys) != 0)])
+    return Polygon(zip(xs[keep], ys[keep])).buffer(0)
+
+
+catids = df['catalog_id'].unique()
+cloud_shapes = [ragged_cloud(-158.0 + rng.uniform(-.1, .1), 21.5 + rng.uniform(-.1, .1), .08) for c in catids]
+clouds = {'features': [{'properties': {'image_identifier': c}, 'geometry': mapping(cloud)}
+                       for c, cloud in zip(catids, cloud_shapes)]}
+print('\n{} clouds, {:.0f} vertices on average'.format(
+    len(catids), np.mean([len(cloud.exterior.coords) for cloud in cloud_shapes])))
+base_seconds, base = timed(lambda: gbdxaoi._cloudFeaturePcts(clouds, gbdxaoi._AOIFootprintCache(df, aoi)), repeat=1)
+base = np.array([p[1] for p in base])
+for tolerance in tolerances[1:]:
+    seconds, pcts = timed(lambda: gbdxaoi._cloudFeaturePcts(clouds, gbdxaoi._AOIFootprintCache(df, aoi), tolerance),
+                          repeat=1)
+    error = np.abs(np.array([p[1] for p in pcts]) - base)
+    bound = np.array([p[3] for p in pcts])
+    print('tolerance {:>5.0f} m: {:.3f}s vs {:.3f}s ({:.1f}x), max cloud cover error {:.4f} pts (bound {:.4f} pts)'.format(
+        tolerance, seconds, base_seconds, base_seconds / seconds, error.max(), bound.max()))
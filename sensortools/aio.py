@@ -0,0 +1,75 @@
+import sensortools.tools.spatial as spatial_tools
+import sensortools.duc as duc
+from sensortools.gbdxaoi import _cloudCatalogBatches, _cloudFeaturePcts, _updateCloudCover, _AOIFootprintCache
+import asyncio
+import aiohttp
+import json
+
+
+async def _fetchClouds(session, semaphore, client, cats, envelope):
+    """
+    POST one DUC cloud query, limited by the semaphore. Stand in clients
+    answer it with their own `aquery` coroutine.
+    """
+    async with semaphore:
+        if hasattr(client, 'aquery'):
+            return await client.aquery(cats, envelope)
+        headers, data = client.request(cats, envelope)
+        async with session.post(client.url, headers=headers, data=data) as response:
+            text = await response.text()
+
+    return json.loads(text)
+
+
+async def aoiCloudCover(df, aoi, client=None, server_filter=False, concurrency=4, batch_size=50, executor=None,
+                        tolerance=None):
+    """
+    asyncio variant of `gbdxaoi.aoiCloudCover`.
+
+    DUC queries are issued concurrently over aiohttp, at most `concurrency` at
+    a time. Each response is handed to `executor` (the loop's default
+    executor if None) for the geometry work as soon as it arrives, so cloud
+    intersections overlap with the remaining network waits. The headers,
+    form data and endpoint come from `client.request` and `client.url` of a
+    `duc.DUCClient`, defaulting to the process-wide client; a stand in client
+    can instead provide an `aquery(cats, envelope=None)` coroutine returning
+    the parsed response. `server_filter` sends the AOI envelope as a spatial
+    filter and `tolerance` simplifies the clouds, as in `gbdxaoi.aoiCloudCover`.
+
+    Example
+    -------
+    from sensortools import aio
+    df = await aio.aoiCloudCover(df, aoi)
+    """
+    if client is None:
+        client = duc.defaultClient()
+    loop = asyncio.get_running_loop()
+
+    # projection info, projected AOI
+    aoi = await loop.run_in_executor(executor, spatial_tools.asAOI, aoi)
+
+    # add column to search df
+    df['AOI Cloud Cover'] = 0
+    df['Cloud WKT'] = ''
+    if tolerance:
+        df['AOI Cloud Cover Error'] = 0.
+
+    aoi_footprints = _AOIFootprintCache(df, aoi)
+    envelope = aoi.bounds if server_filter else None
+
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession() as session:
+        fetches = [asyncio.ensure_future(_fetchClouds(session, semaphore, client, cats, envelope))
+                   for cats in _cloudCatalogBatches(df, batch_size)]
+        try:
+            computes = []
+            for fetch in asyncio.as_completed(fetches):
+                clouds = await fetch
+                computes.append(loop.run_in_executor(executor, _cloudFeaturePcts, clouds, aoi_footprints, tolerance))
+            for pcts in await asyncio.gather(*computes):
+                _updateCloudCover(df, pcts)
+        finally:
+            for fetch in fetches:
+                fetch.cancel()
+
+    return df
@@ -0,0 +1,190 @@
+from sensortools import __version__
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+import tempfile
+import hashlib
+import inspect
+import pickle
+import json
+import copy
+import os
+
+
+class ResultCache(object):
+    """
+    In-memory LRU of results keyed on content hashes, optionally backed by a
+    directory of pickles that survives between sessions
+    """
+
+    def __init__(self, maxsize=128, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self._results = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, '{}.pkl'.format(key))
+
+    def get(self, key):
+        """
+        Return (True, value) for a cached key, (False, None) otherwise
+        """
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return True, self._results[key]
+
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = pickle.load(f)
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError):
+                # unreadable or written by incompatible code, recompute it
+                os.remove(self._path(key))
+            else:
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return True, value
+
+        self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        self._remember(key, value)
+        if self.cache_dir is not None:
+            # write then rename, so readers never see a partial pickle
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def _remember(self, key, value):
+        self._results[key] = value
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop every cached result, including those on disk
+        """
+        self._results.clear()
+        if self.cache_dir is not None:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(('.pkl', '.tmp')):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / float(lookups) if lookups else 0.,
+            'size': len(self._results),
+        }
+
+
+# The active cache, None while caching is disabled
+_cache = None
+
+
+def enableCache(maxsize=128, cache_dir=None):
+    """
+    Turn on memoization of formatSearchResults, aoiFootprintPctCoverage and
+    aoiFootprintIntersection. Results are keyed on a hash of the search
+    records (or the footprints and identifiers of a results df), the AOI and
+    the other arguments, so any change to the inputs misses the cache. The
+    sensortools version is part of the key, so results cached on disk by
+    another release are not reused.
+
+    Example
+    -------
+    from sensortools import cache
+    cache.enableCache(cache_dir='./.sensortools-cache')
+    """
+    global _cache
+    _cache = ResultCache(maxsize=maxsize, cache_dir=cache_dir)
+
+    return _cache
+
+
+def disableCache():
+    global _cache
+    _cache = None
+
+
+def cacheStats():
+    """
+    Hit/miss counts and hit rate of the active cache
+    """
+    if _cache is None:
+        return None
+
+    return _cache.stats()
+
+
+def _hashInput(value, h):
+    if isinstance(value, pd.DataFrame):
+        columns = [c for c in ['image_identifier', 'catalog_id', 'Footprint WKT'] if c in value.columns]
+        h.update(','.join(columns).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(value[columns], index=False).values.tobytes())
+    elif isinstance(value, str):
+        h.update(value.encode('utf-8'))
+    elif hasattr(value, 'wkt'):
+        # shapely geometries and AOI contexts
+        h.update(value.wkt.encode('utf-8'))
+    elif isinstance(value, (list, tuple, dict)):
+        h.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+    else:
+        h.update(repr(value).encode('utf-8'))
+
+
+def hashInputs(name, *values):
+    """
+    Content hash of a function name and its inputs
+    """
+    h = hashlib.sha1(name.encode('utf-8'))
+    for value in values:
+        h.update(b'\0')
+        _hashInput(value, h)
+
+    return h.hexdigest()
+
+
+def memoize(func):
+    """
+    Cache the results of `func` in the active cache, if caching is enabled.
+    Cached values are copied on the way in and out so callers can mutate them.
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if _cache is None:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = hashInputs(func.__name__, __version__, *[bound.arguments[p] for p in signature.parameters])
+
+        hit, value = _cache.get(key)
+        if hit:
+            return copy.deepcopy(value)
+
+        value = func(*args, **kwargs)
+        _cache.set(key, copy.deepcopy(value))
+
+        return value
+
+    return wrapper
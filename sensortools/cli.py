@@ -0,0 +1,227 @@
+import sensortools.tools.spatial as spatial_tools
+import sensortools.gbdxaoi as gbdxaoi
+from multiprocessing import Pool
+from shapely.geometry import shape
+import pandas as pd
+import numpy as np
+import argparse
+import fiona
+import json
+import time
+import os
+
+
+# Search records shared with each worker process and their footprint
+# bounds, set by _initWorker
+_records = None
+_bounds = None
+
+
+def loadCatalog(path):
+    """
+    Load catalog search records from a JSON list of records, or from a
+    Parquet table with an `identifier` column and one column per property
+    """
+    if path.endswith('.parquet'):
+        table = pd.read_parquet(path)
+        properties = table.drop(columns=['identifier'])
+        records = []
+        for identifier, props in zip(table['identifier'], properties.to_dict('records')):
+            props = {k: (None if _isnull(v) else v) for k, v in props.items()}
+            records.append({'identifier': identifier, 'properties': props})
+        return records
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _isnull(value):
+    try:
+        return bool(pd.isnull(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def loadAOIs(path, id_field=None):
+    """
+    Load every feature of a vector file (shapefile, GeoJSON, ...) as an
+    (id, WKT) pair. Ids come from `id_field` or the feature index.
+    """
+    aois = []
+    with fiona.open(path) as src:
+        for i, feature in enumerate(src):
+            aoi_id = feature['properties'][id_field] if id_field else i
+            aois.append((str(aoi_id), shape(feature['geometry']).wkt))
+
+    return aois
+
+
+def _initWorker(records):
+    global _records, _bounds
+    _records = records
+    # footprints are parsed once per worker, not once per AOI
+    stats = spatial_tools.footprintStats([re['properties']['footprintWkt'] for re in records])
+    _bounds = stats[['Min X', 'Min Y', 'Max X', 'Max Y']].values
+
+
+def _outputPath(out_dir, aoi_id, fmt):
+    return os.path.join(out_dir, 'aoi_{}.{}'.format(aoi_id, fmt))
+
+
+def _rowPath(out_dir, aoi_id):
+    return os.path.join(out_dir, 'aoi_{}.summary.json'.format(aoi_id))
+
+
+def _isDone(out_dir, aoi_id, fmt):
+    return os.path.exists(_outputPath(out_dir, aoi_id, fmt)) and os.path.exists(_rowPath(out_dir, aoi_id))
+
+
+def _writeRow(row, path):
+    with open(path, 'w') as f:
+        json.dump({k: (v.item() if hasattr(v, 'item') else v) for k, v in row.items()}, f)
+
+
+def _loadSummary(out_dir, aois):
+    """
+    Summary rows of the AOIs already run, in AOI order, one per aoi_id
+    """
+    rows = []
+    for aoi_id, _ in aois:
+        path = _rowPath(out_dir, aoi_id)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                rows.append(json.load(f))
+    summary = pd.DataFrame(rows)
+    if len(summary):
+        summary['aoi_id'] = summary['aoi_id'].astype(str)
+        summary = summary.drop_duplicates('aoi_id', keep='last').reset_index(drop=True)
+
+    return summary
+
+
+def _writeTable(df, path, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(path)
+    else:
+        df.to_csv(path)
+
+
+def _runAOI(task):
+    """
+    Run format -> coverage -> (optional) cloud cover for one AOI and write its
+    results. Returns a row of the run summary.
+    """
+    aoi_id, aoi, options = task
+    timings = {'aoi_id': aoi_id}
+
+    start = time.time()
+    aoi = spatial_tools.AOI(aoi)
+    # skip records whose footprint bounds miss the AOI, formatSearchResults
+    # drops the remaining footprints that do not intersect it
+    minx, miny, maxx, maxy = aoi.bounds
+    near = np.flatnonzero((_bounds[:, 0] <= maxx) & (_bounds[:, 2] >= minx) &
+                          (_bounds[:, 1] <= maxy) & (_bounds[:, 3] >= miny))
+    records = [_records[j] for j in near]
+    df = gbdxaoi.formatSearchResults(records, aoi, collapse=options['collapse'])
+    timings['format_seconds'] = time.time() - start
+    timings['results'] = len(df)
+
+    start = time.time()
+    timings['coverage_pct'] = gbdxaoi.aoiFootprintPctCoverage(df, aoi) if len(df) else 0.
+    timings['coverage_seconds'] = time.time() - start
+
+    if options['clouds'] and len(df):
+        start = time.time()
+        df = gbdxaoi.aoiCloudCover(df, aoi, server_filter=True)
+        timings['clouds_seconds'] = time.time() - start
+
+    _writeTable(df, _outputPath(options['out'], aoi_id, options['format']), options['format'])
+    # checkpoint this AOI's summary row next to its results
+    _writeRow(timings, _rowPath(options['out'], aoi_id))
+
+    return timings
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def run(catalog, aoi_path, out, id_field=None, workers=1, chunk_size=10, collapse=False,
+        clouds=False, fmt='parquet', overwrite=False):
+    """
+    Run the AOI analysis pipeline for every feature of `aoi_path` against a
+    catalog pull and write one results table per AOI plus a run summary to `out`.
+
+    Each AOI checkpoints its summary row next to its results table. AOIs
+    with both are skipped unless `overwrite` is set, so an interrupted run
+    can be resumed; the summary is rebuilt from the checkpointed rows after
+    every chunk of `chunk_size` AOIs.
+    """
+    if not os.path.isdir(out):
+        os.makedirs(out)
+    summary_path = os.path.join(out, 'summary.{}'.format(fmt))
+
+    start = time.time()
+    records = loadCatalog(catalog)
+    aois = loadAOIs(aoi_path, id_field)
+    load_seconds = time.time() - start
+
+    options = {'out': out, 'format': fmt, 'collapse': collapse, 'clouds': clouds}
+    tasks = [(aoi_id, aoi, options) for aoi_id, aoi in aois
+             if overwrite or not _isDone(out, aoi_id, fmt)]
+
+    print('{} AOIs, {} records, {} to run ({} already done)'.format(
+        len(aois), len(records), len(tasks), len(aois) - len(tasks)))
+
+    start = time.time()
+    pool = Pool(workers, initializer=_initWorker, initargs=(records,)) if workers > 1 else None
+    if pool is None:
+        _initWorker(records)
+    try:
+        for chunk in _chunks(tasks, chunk_size):
+            if pool is None:
+                for task in chunk:
+                    _runAOI(task)
+            else:
+                pool.map(_runAOI, chunk)
+            _writeTable(_loadSummary(out, aois), summary_path, fmt)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    run_seconds = time.time() - start
+
+    summary = _loadSummary(out, aois)
+    print('load: {:.2f}s, run: {:.2f}s over {} workers'.format(load_seconds, run_seconds, workers))
+    for stage in ('format', 'coverage', 'clouds'):
+        column = '{}_seconds'.format(stage)
+        if column in summary.columns:
+            print('{}: {:.2f}s total, {:.3f}s per AOI'.format(stage, summary[column].sum(), summary[column].mean()))
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Format catalog search results, compute footprint coverage and optionally '
+                    'AOI cloud cover for every feature of an AOI file.')
+    parser.add_argument('catalog', help='catalog search results, as JSON or Parquet')
+    parser.add_argument('aoi', help='AOI vector file (shapefile, GeoJSON, ...), one AOI per feature')
+    parser.add_argument('out', help='output directory')
+    parser.add_argument('--id-field', help='AOI property used to name outputs (default: feature index)')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=10, help='AOIs per checkpoint')
+    parser.add_argument('--collapse', action='store_true', help='one row per catalog id')
+    parser.add_argument('--clouds', action='store_true', help='compute AOI cloud cover from DUC')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help='output format')
+    parser.add_argument('--overwrite', action='store_true', help='rerun AOIs that already have outputs')
+    args = parser.parse_args(argv)
+
+    run(args.catalog, args.aoi, args.out, id_field=args.id_field, workers=args.workers,
+        chunk_size=args.chunk_size, collapse=args.collapse, clouds=args.clouds,
+        fmt=args.format, overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+    main()
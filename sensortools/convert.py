@@ -153,3 +153,83 @@ def km2_to_gb(km2, bit_depth=32):
                                                      df.loc[df.Sensor == 'WV04_MS'].GB.values
 
         return df
+
+
+# Bytes per pixel per band of the catalog `dataType` values
+DATA_TYPE_BYTES = {
+    'BYTE': 1,
+    'UNSIGNED_SHORT': 2,
+    'SHORT': 2,
+    'UNSIGNED_INT': 4,
+    'INT': 4,
+    'FLOAT': 4,
+    'DOUBLE': 8,
+}
+
+
+def _tile_size(tile_size, image_size, tile_count):
+    """
+    Tile size in pixels, derived from the image size where the catalog
+    reports a tile size of 0
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        derived = np.ceil(image_size / tile_count)
+
+    return np.where(tile_size > 0, tile_size, derived)
+
+
+def catalog_to_gb(search_results, aggregate=True):
+    """
+    Function that computes the raw and tiled size of each image in catalog
+    search results from its metadata (image and tile dimensions, band count
+    and data type)
+
+    Parameters
+    ----------
+    search_results : list
+        Catalog search results, as passed to `gbdxaoi.formatSearchResults`
+    aggregate : bool
+        Sum the image parts of each acquisition into one row per sensor and
+        catalog id (defaults to True)
+
+    Returns
+    -------
+    df
+        Returns DataFrame with the raw and tiled size in GB of each image or
+        acquisition. Images missing size metadata (e.g. Landsat) or with an
+        unknown data type are left as NaN.
+
+    Example
+    -------
+    from sensortools import convert
+    convert.catalog_to_gb(search_results)
+    """
+    columns = ['imageWidth', 'imageHeight', 'numBands', 'numXTiles', 'numYTiles', 'tileXSize', 'tileYSize']
+    props = pd.DataFrame([re['properties'] for re in search_results]).reindex(
+        columns=columns + ['sensorPlatformName', 'catalogID', 'dataType'])
+    dims = props[columns].apply(pd.to_numeric, errors='coerce').astype(float)
+    pixel_bytes = props['dataType'].map(DATA_TYPE_BYTES).astype(float)
+
+    band_bytes = dims['numBands'].values * pixel_bytes.values
+    raw = dims['imageWidth'].values * dims['imageHeight'].values * band_bytes
+    tile_x = _tile_size(dims['tileXSize'].values, dims['imageWidth'].values, dims['numXTiles'].values)
+    tile_y = _tile_size(dims['tileYSize'].values, dims['imageHeight'].values, dims['numYTiles'].values)
+    tiled = dims['numXTiles'].values * dims['numYTiles'].values * tile_x * tile_y * band_bytes
+
+    df = pd.DataFrame({
+        'image_identifier': [re['identifier'] for re in search_results],
+        'catalog_id': props['catalogID'].values,
+        'Sensor': props['sensorPlatformName'].values,
+        'Data Type': props['dataType'].values,
+        'Band Count': dims['numBands'].values,
+        'Raw Size (GB)': raw / 1e+9,
+        'Tiled Size (GB)': tiled / 1e+9})
+
+    if aggregate:
+        groups = df.groupby(['Sensor', 'catalog_id'], sort=True, dropna=False)
+        sizes = groups[['Raw Size (GB)', 'Tiled Size (GB)']].sum(min_count=1)
+        sizes.insert(0, 'Image Count', groups.size())
+        sizes.insert(1, 'Band Count', groups['Band Count'].sum())
+        df = sizes.reset_index()
+
+    return df
@@ -3,10 +3,10 @@ class InputError(Exception):
 
 
 def ingest_wkt(func):
-    def wrapper(aoi):
+    def wrapper(aoi, *args, **kwargs):
         if not isinstance(aoi, str):
             raise InputError('Input into {} function must be a WKT string'.format(func.__name__))
-        output = func(aoi)
+        output = func(aoi, *args, **kwargs)
         return output
     return wrapper
 
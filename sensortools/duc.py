@@ -0,0 +1,125 @@
+from .exceptions import *
+import requests
+import json
+import os
+
+
+# DUC cloud cover MapServer query endpoint
+DUC_URL = "https://api.discover.digitalglobe.com/v1/services/cloud_cover/MapServer/0/query"
+
+# Environment variables checked for the DUC API key and endpoint
+DUC_API_KEY_ENV = 'DUC_API_KEY'
+DUC_URL_ENV = 'DUC_URL'
+
+# Key file read when no key is given or set in the environment
+DUC_API_KEY_FILE = 'duc-api.txt'
+
+
+def _readAPIkey(path):
+    """
+    Read the DUC API key from the first line of a key file
+    """
+    try:
+        with open(path, 'r') as a:
+            api_key = a.readlines()[0].rstrip()
+    except IOError:
+        raise MissingDUCAPIkeyError('Could not find DUC API key in {}'.format(path))
+    except IndexError:
+        raise DUCAPIkeyFormattingError('Could not find text in {}'.format(path))
+
+    return api_key
+
+
+class DUCClient(object):
+    """
+    Client for the DUC cloud cover query endpoint.
+
+    The API key is resolved once, from the `api_key` argument, the
+    DUC_API_KEY environment variable, or a key file (`key_file`, defaulting
+    to ./duc-api.txt), in that order. The endpoint comes from `url`, the
+    DUC_URL environment variable, or the public DUC endpoint. Requests share
+    one pooled `requests.Session`, so connections are reused across calls.
+
+    Queries given an `envelope` are filtered server side: only clouds
+    intersecting the envelope are returned, with just the catalog id field,
+    coordinates rounded to `geometry_precision` decimals and, if set,
+    generalized by `max_allowable_offset` degrees.
+
+    Any object with a `query(cats, envelope=None)` method returning the
+    parsed GeoJSON response can stand in for a client, e.g. a local stub.
+    For `aio.aoiCloudCover` a stand in provides an `aquery(cats,
+    envelope=None)` coroutine instead; real clients are queried over aiohttp
+    with the headers and form data of `request`.
+
+    Example
+    -------
+    from sensortools.duc import DUCClient
+    client = DUCClient(key_file='/etc/duc-api.txt')
+    df = gbdxaoi.aoiCloudCover(df, aoi, client=client)
+    """
+
+    def __init__(self, api_key=None, url=None, key_file=None, session=None,
+                 geometry_precision=6, max_allowable_offset=None):
+        if api_key is None:
+            api_key = os.environ.get(DUC_API_KEY_ENV)
+        if api_key is None:
+            api_key = _readAPIkey(key_file or DUC_API_KEY_FILE)
+        self.api_key = api_key
+        self.url = url or os.environ.get(DUC_URL_ENV) or DUC_URL
+        self.session = session if session is not None else requests.Session()
+        self.geometry_precision = geometry_precision
+        self.max_allowable_offset = max_allowable_offset
+
+    def request(self, cats, envelope=None):
+        """
+        Headers and form data for a DUC cloud query of a group of catalog ids,
+        optionally restricted to a (minx, miny, maxx, maxy) envelope in 4326
+        """
+        headers = {
+            'x-api-key': "{api_key}".format(api_key=self.api_key),
+            'content-type': "application/x-www-form-urlencoded"
+        }
+        data = {
+            'outFields': '*',
+            'where': "image_identifier IN ({cat})".format(cat="'" + "','".join(cats) + "'"),
+            'outSR': '4326',
+            'f': 'geojson'
+        }
+        if envelope is not None:
+            data.update({
+                'outFields': 'image_identifier',
+                'geometry': ','.join(repr(float(v)) for v in envelope),
+                'geometryType': 'esriGeometryEnvelope',
+                'inSR': '4326',
+                'spatialRel': 'esriSpatialRelIntersects',
+            })
+            if self.geometry_precision is not None:
+                data['geometryPrecision'] = str(self.geometry_precision)
+            if self.max_allowable_offset is not None:
+                data['maxAllowableOffset'] = str(self.max_allowable_offset)
+
+        return headers, data
+
+    def query(self, cats, envelope=None):
+        """
+        Query the cloud geometries of a group of catalog ids
+        """
+        headers, data = self.request(cats, envelope)
+        response = self.session.post(self.url, headers=headers, data=data)
+
+        return json.loads(response.text)
+
+
+_default_client = None
+
+
+def defaultClient():
+    """
+    Return a process-wide DUCClient, created on first use so the key is only
+    loaded once per process
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = DUCClient()
+
+    return _default_client
@@ -1,8 +1,8 @@
 class MissingDUCAPIkeyError(Exception):
-    """Raised when a ./duc-api.txt cannot be found"""
+    """Raised when no DUC API key is given, set in the environment or found in a key file"""
     pass
 
 
 class DUCAPIkeyFormattingError(Exception):
-    """Raised when DUC key cannot be extracted from ./duc-api.txt"""
+    """Raised when DUC key cannot be extracted from the key file"""
     pass
@@ -1,44 +1,146 @@
 import sensortools.tools.spatial as spatial_tools
-from functools import partial
-from shapely.geos import TopologicalError
-from shapely.ops import transform
+import sensortools.tools.raster as raster_tools
+import sensortools.convert as convert
+import sensortools.duc as duc
+from sensortools.decorators import InputError
+from collections import OrderedDict
+from queue import Queue, Empty, Full
+from shapely.prepared import prep
+from shapely.strtree import STRtree
 import shapely.geometry
+import shapely.ops
 import shapely.wkt
 from .exceptions import *
+from .query import SearchQuery
+from .cache import memoize
 import pandas as pd
 import numpy as np
-import requests
+import threading
 import shapely
 import pyproj
-import json
+import fiona
+import time
 
 
-def _fpaoiintersect(fp_wkt, aoi):
+def _projectedIntersection(aoi, fp, tolerance=None):
     """
-    Calculate the percent intersection of a footprint wkt and an AOI
+    Intersection of the AOI and a footprint, projected into the AOI's UTM
+    zone, the footprint simplified to `tolerance` meters first if given.
+    Shapes touching each other's boundary are intersected exactly, since
+    projecting bends their shared edges differently.
     """
-    # The projected aoi
-    aoi_shp_prj = spatial_tools.utm_reproject_vector(aoi)
+    if prep(fp).contains_properly(aoi.geometry):
+        # the AOI is entirely inside the footprint
+        return aoi.projected
+    if aoi.prepared.contains_properly(fp):
+        # the footprint is entirely inside the AOI
+        return aoi.project(fp, tolerance)
 
-    # The projected footprint
-    ft_shp_prj = spatial_tools.utm_reproject_vector(fp_wkt)
+    return aoi.projected.intersection(aoi.project(fp, tolerance))
 
-    # Intersect the two shapes
-    inter_km2 = aoi_shp_prj.intersection(ft_shp_prj).area / 1000000.
+
+def _fpaoiintersect(fp_wkt, aoi, tolerance=None, return_error=False):
+    """
+    Calculate the percent intersection of a footprint wkt (or shapely
+    geometry) and an AOI (WKT or spatial_tools.AOI). The footprint is projected
+    into the AOI's UTM zone, simplified to `tolerance` meters first if given;
+    `return_error` returns (percent, bound on the percent error).
+
+    Footprints are first classified against the prepared AOI, so only
+    footprints that overlap or touch the AOI boundary need an exact
+    intersection.
+    """
+    aoi = spatial_tools.asAOI(aoi)
+    fp = shapely.wkt.loads(fp_wkt) if isinstance(fp_wkt, str) else fp_wkt
+
+    # no overlap
+    if aoi.prepared.disjoint(fp):
+        return (0., 0.) if return_error else 0.
 
     # Calculate area in km2
-    pct = inter_km2 / spatial_tools.aoiArea(aoi) * 100.
+    inter_km2 = _projectedIntersection(aoi, fp, tolerance).area / 1000000.
+
+    pct = inter_km2 / aoi.area * 100.
+    if return_error:
+        return pct, min(spatial_tools.simplifyErrorBound(fp, tolerance) / aoi.area * 100., 100.)
 
     return pct
 
 
-def formatSearchResults(search_results, aoi):
+def _collapseCatalogRecords(search_results):
+    """
+    Group search records by catalog ID so that each acquisition is represented
+    by one canonical record. The acquisition record itself is preferred;
+    otherwise the footprints of the image parts are unioned. Properties missing
+    from the canonical record are filled from the parts.
+    """
+    groups = OrderedDict()
+    for re in search_results:
+        key = re['properties'].get('catalogID') or re['identifier']
+        groups.setdefault(key, []).append(re)
+
+    collapsed = []
+    for key, records in groups.items():
+        canonical = [r for r in records if r['identifier'] == key]
+        base = canonical[0] if canonical else records[0]
+
+        properties = dict(base['properties'])
+        for r in records:
+            for prop, value in r['properties'].items():
+                if properties.get(prop) is None:
+                    properties[prop] = value
+        if not canonical and len(records) > 1:
+            shps = [shapely.wkt.loads(r['properties']['footprintWkt']) for r in records]
+            properties['footprintWkt'] = shapely.ops.unary_union(shps).wkt
+
+        collapsed.append(({'identifier': base['identifier'], 'properties': properties},
+                          [r['identifier'] for r in records]))
+
+    return collapsed
+
+
+def formatSearchResults(search_results, aoi, collapse=False, compact=False, tolerance=None, verbose=False):
     """
     Format the results into a pandas df. To be used in plotting functions
     but also useful outside of them.
+
+    If `collapse` is True, records sharing a catalog ID (the acquisition and
+    its IDAHO image parts) are reduced to one row per acquisition, with the
+    part identifiers listed in `Image Identifiers`.
+
+    If `compact` is True, the df is returned with memory-compact dtypes, see
+    `compactSearchResults`; the memory before and after is printed if
+    `verbose` is True. Compaction runs after the (cached) formatting, so
+    neither argument is part of the cache key.
+
+    `aoi` may be a WKT or a prebuilt spatial_tools.AOI. With `tolerance`
+    (meters) footprints are simplified before they are intersected with it,
+    and a bound on each percent's error is stored in
+    `Footprint AOI Inter Percent Error`.
     """
-    ids, cat, s, pr, mr, t, c, n, e, f, i, k, ta = [], [], [], [], [], [], [], [], [], [], [], [], []
-    for j, re in enumerate(search_results):
+    df = _formatSearchResults(search_results, aoi, collapse, tolerance)
+
+    if compact:
+        df = compactSearchResults(df, verbose=verbose)
+
+    return df
+
+
+@memoize
+def _formatSearchResults(search_results, aoi, collapse=False, tolerance=None):
+    """
+    Formatted search results of `formatSearchResults`, before compaction
+    """
+    aoi = spatial_tools.asAOI(aoi)
+
+    if collapse:
+        records = _collapseCatalogRecords(search_results)
+    else:
+        records = [(re, [re['identifier']]) for re in search_results]
+
+    ids, cat, s, pr, mr, t, c, n, e, f, ta, parts = [], [], [], [], [], [], [], [], [], [], [], []
+    for j, (re, part_ids) in enumerate(records):
+        parts.append(part_ids)
         ids.append(re['identifier'])
         cat.append(re['properties'].get('catalogID'))
         s.append(re['properties']['sensorPlatformName'])
@@ -60,8 +162,16 @@ def formatSearchResults(search_results, aoi):
         except KeyError:
             e.append(0)
         f.append(re['properties']['footprintWkt'])
-        i.append(_fpaoiintersect(re['properties']['footprintWkt'], aoi))
-        k.append(spatial_tools.aoiArea(re['properties']['footprintWkt']))
+
+    # footprint areas and bounds from one bulk parse of the WKTs; only the
+    # footprints whose bounds reach the AOI are intersected with it
+    footprints = spatial_tools.footprintStats(f)
+    k = footprints['Area (km2)'].values
+    minx, miny, maxx, maxy = aoi.bounds
+    near = ((footprints['Min X'] <= maxx) & (footprints['Max X'] >= minx) &
+            (footprints['Min Y'] <= maxy) & (footprints['Max Y'] >= miny)).values
+    i = [_fpaoiintersect(fp, aoi, tolerance, return_error=True) if near[j] else (0., 0.) for j, fp in enumerate(f)]
+    i, i_error = [p for p, _ in i], [err for _, err in i]
 
     df = pd.DataFrame({
         'image_identifier': ids,
@@ -78,6 +188,11 @@ def formatSearchResults(search_results, aoi):
         'Footprint Area (km2)': k,
         'Footprint AOI Inter Percent': i},
         index=pd.to_datetime(t))
+    if tolerance:
+        df['Footprint AOI Inter Percent Error'] = i_error
+    if collapse:
+        df['Image Count'] = [len(p) for p in parts]
+        df['Image Identifiers'] = [','.join(p) for p in parts]
     df.sort_values(['Date'], inplace=True)
     # for some reason, search results spit back geoms that do not intersect
     # the aoi... so must remove 0's
@@ -88,141 +203,742 @@ def formatSearchResults(search_results, aoi):
     return df
 
 
-def aoiFootprintIntersection(df, aoi):
+def _memoryMB(df):
+    return df.memory_usage(deep=True, index=True).sum() / 1e6
+
+
+def compactSearchResults(df, drop_wkt=False, verbose=False):
+    """
+    Convert formatted search results to memory-compact dtypes: categorical
+    sensor and catalog ids, float32 angles/areas/percentages and a nullable
+    integer cloud cover. The duplicate datetime index and the `x` range
+    column are dropped, leaving `Date` as the only datetime column.
+    Optionally drop the WKT text columns. Returns a new df; the memory saved
+    is printed if `verbose` is True.
+    """
+    before = _memoryMB(df) if verbose else None
+    df = df.reset_index(drop=True)
+    if 'x' in df.columns:
+        df = df.drop(columns=['x'])
+
+    for column in ['Sensor', 'catalog_id']:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    # image identifiers are usually unique, where a category would not save memory
+    if 'image_identifier' in df.columns and df['image_identifier'].nunique() < len(df) / 2.:
+        df['image_identifier'] = df['image_identifier'].astype('category')
+
+    for column in ['Pan Resolution', 'MS Resolution', 'Off Nadir Angle', 'Sun Elevation', 'Target Azimuth',
+                   'Footprint Area (km2)', 'Footprint AOI Inter Percent', 'Footprint AOI Inter Percent Error',
+                   'AOI Cloud Cover']:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column]).astype(np.float32)
+
+    if 'Cloud Cover' in df.columns:
+        cloud = pd.to_numeric(df['Cloud Cover'])
+        if ((cloud.dropna() % 1) == 0).all() and cloud.dropna().between(0, 100).all():
+            df['Cloud Cover'] = cloud.astype('UInt8')
+        else:
+            df['Cloud Cover'] = cloud.astype(np.float32)
+
+    if drop_wkt:
+        df = df.drop(columns=[c for c in ['Footprint WKT', 'Cloud WKT'] if c in df.columns])
+
+    if verbose:
+        print('Search results memory: {:.2f} MB -> {:.2f} MB'.format(before, _memoryMB(df)))
+
+    return df
+
+
+@memoize
+def aoiFootprintIntersection(df, aoi, tolerance=None, return_error=False):
     """
     Given an AOI and search results, return a shapely object of the intersection between the search results and the aoi
+    With `tolerance` (meters) the footprint union is simplified before projection; `return_error` returns
+    (intersection, bound on the area error in km2).
     ----------
     FORMERLY aoiFootprintCalculations
     returned pct (% overlap) as first argument and `inter_json` as the second argument
     Note: pct (% overlap) can still be calculated using the aoiFootprintPctCoverage function
     """
-    # projection info
-    to_p = spatial_tools.getUTMProj(aoi)
-    from_p = pyproj.Proj(init='epsg:4326')
+    aoi = spatial_tools.asAOI(aoi)
 
-    # project the AOI
-    aoi_shp_prj = spatial_tools.utm_reproject_vector(aoi)
-
-    # union all the footprint shapes
-    shps = []
-    for i, row in df.iterrows():
-        shps.append(shapely.wkt.loads(row['Footprint WKT']))
+    # union all the footprint shapes, skipping duplicate footprints
+    shps = [shapely.wkt.loads(fp) for fp in df['Footprint WKT'].unique()]
     footprints = shapely.ops.cascaded_union(shps)
     print('footprints wkt', footprints.wkt)
 
     # project the footprint union
-    footprints_prj = spatial_tools.utm_reproject_vector(footprints.wkt)
+    footprints_prj = aoi.project(footprints, tolerance)
 
     # perform intersection
-    inter_shp_prj = aoi_shp_prj.intersection(footprints_prj)
+    inter_shp_prj = aoi.projected.intersection(footprints_prj)
 
     # project back to wgs84/wkt for mapping
-    project_reverse = partial(pyproj.transform, to_p, from_p)
-    inter_shp = transform(project_reverse, inter_shp_prj)
+    inter_shp = aoi.unproject(inter_shp_prj)
     print('intersection wkt ', inter_shp.wkt)
 
+    if return_error:
+        return inter_shp, spatial_tools.simplifyErrorBound(footprints, tolerance)
+
     return inter_shp
 
 
-def aoiFootprintPctCoverage(df, aoi):
+@memoize
+def aoiFootprintPctCoverage(df, aoi, tolerance=None, return_error=False):
     """
-    Return the percent area covered from aoi footprint calculation
+    Return the percent area covered from aoi footprint calculation, the
+    footprint union simplified to `tolerance` meters first if given.
+    `return_error` returns (percent, bound on the percent error).
     """
-    # union all the footprint shapes and project to utm
-    shps = []
-    for i, row in df.iterrows():
-        shps.append(shapely.wkt.loads(row['Footprint WKT']))
+    # union all the footprint shapes, skipping duplicate footprints
+    shps = [shapely.wkt.loads(fp) for fp in df['Footprint WKT'].unique()]
     footprints = shapely.ops.cascaded_union(shps)
 
     # Take the intersection of the aoi and the footprints and calculate %
-    pct = _fpaoiintersect(footprints.wkt, aoi)
+    return _fpaoiintersect(footprints, aoi, tolerance, return_error)
 
-    return pct
 
-
-def aoiCloudCover(df, aoi):
+def aoiCoverageGrid(df, aoi, cell_size=100., max_cloud=None, max_off_nadir=None, use_clouds=True):
     """
-    For each footprint in the search results, calculate a percent cloud
-    cover for the AOI (instead of entire strip)
+    Rasterize the footprints of the search results onto a UTM grid over the
+    AOI and count how many times each cell was imaged.
+
+    Each catalog id is counted once (its first footprint, as in
+    `aoiCloudCover`), rows without a catalog id once each. Results can be filtered by strip cloud cover and off
+    nadir angle first. If the df has a `Cloud WKT` column from
+    `aoiCloudCover` and `use_clouds` is True, cloud-free counts are computed
+    as well.
+
+    Returns
+    -------
+    dict
+        'count': revisit count per cell
+        'cloud_free_count': cloud-free revisit count per cell (None without clouds)
+        'latest': latest acquisition date per cell (NaT where never imaged)
+        'aoi_mask': cells whose centers fall inside the AOI
+        'origin': (x, y) of the grid's top left corner in the AOI's UTM zone
+        'cell_size': cell size in meters
+        'crs': proj4 string of the AOI's UTM zone
     """
-    try:
-        with open('duc-api.txt', 'r') as a:
-            api_key = a.readlines()[0].rstrip()
-    except IOError:
-        raise MissingDUCAPIkeyError('Could not find DUC API key in ./duc-api.txt')
-    except IndexError:
-        raise DUCAPIkeyFormattingError('Could not find text in ./duc-api.txt')
-
-    # projection info
-    to_p = spatial_tools.getUTMProj(aoi)
+    aoi = spatial_tools.asAOI(aoi)
+
+    q = SearchQuery(df)
+    if max_cloud is not None:
+        q = q.cloudCover(max=max_cloud)
+    if max_off_nadir is not None:
+        q = q.offNadir(max=max_off_nadir)
+    results = q.results()
+    # rows without a catalog id (e.g. Landsat) are separate acquisitions
+    results = results[results['catalog_id'].isnull() | ~results['catalog_id'].duplicated()]
+
+    origin, shape = raster_tools.grid_for_bounds(aoi.projected.bounds, cell_size)
+    window, mask = raster_tools.polygon_window_mask(aoi.projected, origin, cell_size, shape)
+    aoi_mask = np.zeros(shape, dtype=bool)
+    if window is not None:
+        aoi_mask[window] = mask
+
+    use_clouds = use_clouds and 'Cloud WKT' in results.columns
+    count = np.zeros(shape, dtype=np.int32)
+    cloud_free = np.zeros(shape, dtype=np.int32) if use_clouds else None
+    latest = np.full(shape, np.iinfo(np.int64).min, dtype=np.int64)
+    dates = pd.DatetimeIndex(results['Date'])
+    if dates.tz is not None:
+        dates = dates.tz_convert('UTC').tz_localize(None)
+    dates = dates.asi8
+
+    for j, fp_wkt in enumerate(results['Footprint WKT'].values):
+        fp_prj = aoi.project(shapely.wkt.loads(fp_wkt))
+        window, mask = raster_tools.polygon_window_mask(fp_prj, origin, cell_size, shape)
+        if window is None:
+            continue
+        mask &= aoi_mask[window]
+        count[window] += mask
+        latest[window][mask] = np.maximum(latest[window][mask], dates[j])
+
+        if use_clouds:
+            cloud_wkt = results['Cloud WKT'].values[j]
+            if isinstance(cloud_wkt, str) and cloud_wkt:
+                c_window, c_mask = raster_tools.polygon_window_mask(
+                    aoi.project(shapely.wkt.loads(cloud_wkt)), origin, cell_size, shape)
+                if c_window is not None:
+                    # clear the cloudy cells where the two windows overlap
+                    rows = slice(max(window[0].start, c_window[0].start), min(window[0].stop, c_window[0].stop))
+                    cols = slice(max(window[1].start, c_window[1].start), min(window[1].stop, c_window[1].stop))
+                    if rows.start < rows.stop and cols.start < cols.stop:
+                        mask[rows.start - window[0].start:rows.stop - window[0].start,
+                             cols.start - window[1].start:cols.stop - window[1].start] &= \
+                            ~c_mask[rows.start - c_window[0].start:rows.stop - c_window[0].start,
+                                    cols.start - c_window[1].start:cols.stop - c_window[1].start]
+            cloud_free[window] += mask
+
+    return {
+        'count': count,
+        'cloud_free_count': cloud_free,
+        'latest': latest.view('datetime64[ns]'),
+        'aoi_mask': aoi_mask,
+        'origin': origin,
+        'cell_size': cell_size,
+        'crs': aoi.to_p.srs,
+    }
+
+
+def _gridTiles(aoi, tile_size):
+    """
+    Fixed size tiles over the AOI in its UTM zone, aligned to multiples of
+    the tile size and clipped to the AOI
+    """
+    origin, (rows, cols) = raster_tools.grid_for_bounds(aoi.projected.bounds, tile_size)
+    prepared = prep(aoi.projected)
+
+    ids, tiles = [], []
+    for r in range(rows):
+        for c in range(cols):
+            minx, maxy = origin[0] + c * tile_size, origin[1] - r * tile_size
+            cell = shapely.geometry.box(minx, maxy - tile_size, minx + tile_size, maxy)
+            if prepared.contains(cell):
+                tile = cell
+            elif prepared.intersects(cell):
+                tile = aoi.projected.intersection(cell)
+                if tile.area == 0:
+                    continue
+            else:
+                continue
+            ids.append('{}_{}'.format(r, c))
+            tiles.append(tile)
+
+    return [(np.arange(len(tiles)), ids, tiles, [aoi.unproject(t) for t in tiles], aoi.to_utm)]
+
+
+def _layerTiles(tiles, id_field=None):
+    """
+    Tiles from a vector file or a list of WKT/geometries, grouped by the UTM
+    zone of their centroids and projected into it. Each group carries the
+    input positions of its tiles.
+    """
+    if isinstance(tiles, str):
+        ids, shps = [], []
+        with fiona.open(tiles) as src:
+            for i, feature in enumerate(src):
+                ids.append(str(feature['properties'][id_field]) if id_field else str(i))
+                shps.append(shapely.geometry.shape(feature['geometry']))
+    else:
+        shps = [shapely.wkt.loads(t) if isinstance(t, str) else t for t in tiles]
+        ids = [str(i) for i in range(len(shps))]
+    if not shps:
+        return []
+
+    centroids = [shp.centroid for shp in shps]
+    latitudes, longitudes = [c.y for c in centroids], [c.x for c in centroids]
+    zones, hemispheres = spatial_tools.utmZones(latitudes, longitudes)
+    epsg = spatial_tools.utmEPSG(latitudes, longitudes)
+
+    groups = []
     from_p = pyproj.Proj(init='epsg:4326')
-    project = partial(pyproj.transform, from_p, to_p)
+    for code in np.unique(epsg):
+        members = np.flatnonzero(epsg == code)
+        to_p = spatial_tools._utm_proj(zones[members[0]], hemispheres[members[0]])
+        to_utm = pyproj.Transformer.from_proj(from_p, to_p, always_xy=True)
+        group = [shps[j] for j in members]
+        groups.append((members, [ids[j] for j in members],
+                       [shapely.ops.transform(to_utm.transform, shp) for shp in group], group, to_utm))
 
-    # project the AOI, calc area
-    aoi_shp_prj = spatial_tools.utm_reproject_vector(aoi)
+    return groups
 
-    # add column to search df
-    df['AOI Cloud Cover'] = 0
-    df['Cloud WKT'] = ''
 
+def _tileCoverage(tiles, footprints):
+    """
+    Footprint count and area of each projected tile covered by the union of
+    the projected footprints
+    """
+    counts = np.zeros(len(tiles), dtype=int)
+    covered = np.zeros(len(tiles))
+    if not footprints:
+        return counts, covered
+
+    tree = STRtree(footprints)
+    prepared = [prep(fp) for fp in footprints]
+    for j, tile in enumerate(tiles):
+        tile_prep = prep(tile)
+        hits = [k for k in tree.query_items(tile) if not prepared[k].disjoint(tile)]
+        counts[j] = len(hits)
+        if not hits:
+            continue
+        if any(prepared[k].contains(tile) for k in hits):
+            covered[j] = tile.area
+            continue
+        pieces = [footprints[k] if tile_prep.contains(footprints[k]) else footprints[k].intersection(tile)
+                  for k in hits]
+        covered[j] = shapely.ops.unary_union(pieces).area
+
+    return counts, covered
+
+
+def aoiTileSizing(df, aoi=None, tile_size=5000., tiles=None, id_field=None, bit_depth=32):
+    """
+    Split an order into tiles and size each one: the tile area, the area
+    covered by the search result footprints and the GB that area amounts to
+    for each sensor product of `convert.km2_to_gb`.
+
+    Tiles are either a grid of `tile_size` meter squares over `aoi` in its
+    UTM zone, clipped to the AOI, or the features of `tiles`, a vector file
+    (named by `id_field` or the feature index) or a list of WKT/geometries.
+    Layer tiles are measured in the UTM zone of their centroid.
+
+    Returns
+    -------
+    df
+        one row per tile, indexed by tile id, with 'Tile WKT', 'Tile Area (km2)',
+        'Footprint Count', 'Covered Area (km2)', 'Coverage Percent' and a
+        '<sensor> GB' column per sensor product
+
+    Example
+    -------
+    sizing = gbdxaoi.aoiTileSizing(df, aoi, tile_size=10000)
+    sizing = gbdxaoi.aoiTileSizing(df, tiles='data/japan_urban.shp')
+    """
+    if tiles is None:
+        if aoi is None:
+            raise InputError('aoiTileSizing needs an aoi to grid or a tile layer')
+        groups = _gridTiles(spatial_tools.asAOI(aoi), tile_size)
+    else:
+        groups = _layerTiles(tiles, id_field)
+
+    # each distinct footprint is indexed once and projected once per UTM zone
+    footprints = [shapely.wkt.loads(fp) for fp in df['Footprint WKT'].unique()]
+    tree = STRtree(footprints) if footprints else None
+
+    positions, ids, wkts, areas, counts, covered = [], [], [], [], [], []
+    for group_positions, group_ids, tiles_prj, tiles_ll, to_utm in groups:
+        if tree is not None and tiles_ll:
+            bounds = np.array([t.bounds for t in tiles_ll])
+            extent = shapely.geometry.box(bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+            fps = [shapely.ops.transform(to_utm.transform, footprints[k]) for k in tree.query_items(extent)]
+        else:
+            fps = []
+        group_counts, group_covered = _tileCoverage(tiles_prj, fps)
+
+        positions.extend(group_positions)
+        ids.extend(group_ids)
+        wkts.extend(t.wkt for t in tiles_ll)
+        areas.extend(t.area for t in tiles_prj)
+        counts.append(group_counts)
+        covered.append(group_covered)
+
+    areas = np.array(areas, dtype=float) / 1000000.
+    covered = np.concatenate(covered) / 1000000. if covered else np.zeros(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(areas > 0, covered / areas * 100., 0.)
+
+    sizing = pd.DataFrame({
+        'Tile WKT': wkts,
+        'Tile Area (km2)': areas,
+        'Footprint Count': np.concatenate(counts) if counts else np.zeros(0, dtype=int),
+        'Covered Area (km2)': covered,
+        'Coverage Percent': pct},
+        index=pd.Index(ids, name='tile_id'))
+
+    # GB scales linearly with area, so one km2 gives the rate for every tile
+    rates = convert.km2_to_gb(1, bit_depth=bit_depth)
+    gb = pd.DataFrame(np.outer(covered, rates['GB'].values),
+                      columns=['{} GB'.format(sensor) for sensor in rates['Sensor']], index=sizing.index)
+
+    # rows in input order rather than grouped by UTM zone
+    return pd.concat([sizing, gb], axis=1).iloc[np.argsort(positions, kind='stable')]
+
+
+# Marks the end of the fetch stage in the aoiCloudCover pipeline
+_PIPELINE_DONE = object()
+
+
+def _cloudCatalogBatches(df, batch_size=50):
+    """
+    Split the catalog ids with cloud cover into groups so the DUC API doesn't choke
+    """
     # search the results, do not submit catids with 0 cloud cover
     catids = df[df['Cloud Cover'] > 0].catalog_id.values
+    if not len(catids):
+        return []
 
-    # split catids into groups of 50 so API doesn't choke
-    cat_arr = np.array_split(catids, np.ceil(len(catids) / 50.))
-
-    # iterate over groups of 50
-    for cats in cat_arr:
-        # send request to DUC database
-        url = "https://api.discover.digitalglobe.com/v1/services/cloud_cover/MapServer/0/query"
-        headers = {
-            'x-api-key': "{api_key}".format(api_key=api_key),
-            'content-type': "application/x-www-form-urlencoded"
-        }
-        data = {
-            'outFields': '*',
-            'where': "image_identifier IN ({cat})".format(cat="'" + "','".join(cats) + "'"),
-            'outSR': '4326',
-            'f': 'geojson'
-        }
-        response = requests.request("POST", url, headers=headers, data=data)
-        clouds = json.loads(response.text)
+    return np.array_split(catids, np.ceil(len(catids) / float(batch_size)))
 
+
+class _AOIFootprintCache(object):
+    """
+    Intersections of the projected AOI with each catalog id's projected
+    footprint, computed once per catalog id and reused for every cloud feature
+    """
+    def __init__(self, df, aoi):
+        self.footprints = df.drop_duplicates('catalog_id').set_index('catalog_id')['Footprint WKT']
+        self.aoi = aoi
+        self._intersections = {}
+
+    def get(self, catid):
+        """
+        Return the AOI/footprint intersection in UTM and its area in km2
+        """
         try:
-            # iterate over the clouds and perform cloud cover percent
-            for feature in clouds['features']:
-                # get catalog id
-                c = feature['properties']['image_identifier']
-
-                # get the footprint shape
-                fp = shapely.wkt.loads(df.loc[df['catalog_id'] == c, 'Footprint WKT'].values[0])
-                fp_prj = transform(project, fp)
-
-                # intersect the AOI with the footprint
-                # using this as intersection with clouds
-                aoi_fp_inter = aoi_shp_prj.intersection(fp_prj)
-                aoi_fp_inter_km2 = aoi_fp_inter.area / 1000000.
-
-                # extract the clouds and conver to shape
-                cloud = shapely.geometry.shape(feature['geometry'])
-                cloud_prj = transform(project, cloud)
-
-                # perform intersection and calculate area
-                try:
-                    inter_shp_prj = aoi_fp_inter.intersection(cloud_prj)
-                except TopologicalError:
-                    cloud_prj = cloud_prj.buffer(0.0)
-                    inter_shp_prj = aoi_fp_inter.intersection(cloud_prj)
-
-                inter_km2 = inter_shp_prj.area / 1000000.
-
-                pct = inter_km2 / aoi_fp_inter_km2 * 100.
-
-                # update the dataframe
-                df.loc[df['catalog_id'] == c, 'AOI Cloud Cover'] = pct
-                df.loc[df['catalog_id'] == c, 'Cloud WKT'] = cloud.wkt
+            return self._intersections[catid]
         except KeyError:
-            # no clouds, move on...
-            print('Warning, No Clouds Found...')
+            pass
+        aoi_fp_inter = _projectedIntersection(self.aoi, shapely.wkt.loads(self.footprints[catid]))
+        self._intersections[catid] = (aoi_fp_inter, aoi_fp_inter.area / 1000000.)
+
+        return self._intersections[catid]
+
+
+def _cloudFeaturePcts(clouds, aoi_footprints, tolerance=None):
+    """
+    Calculate the AOI cloud cover percent for each feature of a DUC response.
+    Clouds are simplified to `tolerance` meters before projection if given.
+    Returns a list of (catalog id, percent, cloud wkt, percent error bound),
+    does not modify df.
+    """
+    try:
+        features = clouds['features']
+        catids = [feature['properties']['image_identifier'] for feature in features]
+    except KeyError:
+        # no clouds, move on...
+        print('Warning, No Clouds Found...')
+        return []
+
+    clouds_shp = [shapely.geometry.shape(feature['geometry']) for feature in features]
+
+    return _cloudPcts(catids, clouds_shp, aoi_footprints, tolerance)
+
+
+def _cloudPcts(catids, clouds_shp, aoi_footprints, tolerance=None):
+    """
+    AOI cloud cover percent for each (catalog id, cloud geometry in 4326)
+    """
+    # project and repair every cloud up front so the intersections below
+    # never fail and retry
+    simplified = [spatial_tools.simplifyGeometry(cloud, tolerance)[0] for cloud in clouds_shp]
+    clouds_prj = [aoi_footprints.aoi.project(cloud) for cloud in simplified]
+    clouds_prj = [cloud if cloud.is_valid else cloud.buffer(0.0) for cloud in clouds_prj]
+
+    pcts = []
+    for c, cloud, cloud_s, cloud_prj in zip(catids, clouds_shp, simplified, clouds_prj):
+        # intersection of the AOI with the footprint, cached per catalog id
+        aoi_fp_inter, aoi_fp_inter_km2 = aoi_footprints.get(c)
+
+        # perform intersection and calculate area
+        inter_km2 = aoi_fp_inter.intersection(cloud_prj).area / 1000000.
+
+        pct = inter_km2 / aoi_fp_inter_km2 * 100. if aoi_fp_inter_km2 else 0.
+
+        error = 0.
+        if tolerance and aoi_fp_inter_km2:
+            # only the cloud outline inside the AOI/footprint intersection
+            # moves the percent, scaled back up to the unsimplified outline
+            inside = cloud_prj.boundary.intersection(aoi_fp_inter).length
+            scale = cloud.length / cloud_s.length if cloud_s.length else 1.
+            error = min(inside * scale * tolerance / 1000000. / aoi_fp_inter_km2 * 100., 100.)
+
+        pcts.append((c, pct, cloud.wkt, error))
+
+    return pcts
+
+
+def _updateCloudCover(df, pcts):
+    """
+    Write per catalog id cloud cover results into the search df
+    """
+    if not pcts:
+        return
+    catids, pct, cloud_wkt, error = zip(*pcts)
+    # the last feature returned for a catalog id wins
+    results = pd.DataFrame({'pct': pct, 'wkt': cloud_wkt, 'error': error}, index=catids)
+    results = results[~results.index.duplicated(keep='last')]
+
+    hit = df['catalog_id'].isin(results.index)
+    matched = results.loc[df.loc[hit, 'catalog_id']]
+    df.loc[hit, 'AOI Cloud Cover'] = matched['pct'].values
+    df.loc[hit, 'Cloud WKT'] = matched['wkt'].values
+    if 'AOI Cloud Cover Error' in df.columns:
+        df.loc[hit, 'AOI Cloud Cover Error'] = matched['error'].values
+
+
+def _putUnlessStopped(queue, item, stop):
+    """
+    Put an item on the bounded queue, giving up once `stop` is set
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _fetchCloudBatches(batches, client, envelope, queue, stats, stop):
+    """
+    Fetch stage of the cloud cover pipeline: POST each group of catalog ids to
+    DUC and put the parsed response on the (bounded) queue, until done or
+    `stop` is set by the consumer
+    """
+    try:
+        for cats in batches:
+            if stop.is_set():
+                return
+            start = time.time()
+            # send request to DUC database
+            clouds = client.query(cats, envelope)
+            stats['fetch']['seconds'] += time.time() - start
+            stats['fetch']['batches'] += 1
+            stats['fetch']['features'] += len(clouds.get('features', []))
+            if not _putUnlessStopped(queue, clouds, stop):
+                return
+    except Exception as e:
+        _putUnlessStopped(queue, e, stop)
+    _putUnlessStopped(queue, _PIPELINE_DONE, stop)
+
+
+def _startFetcher(batches, client, envelope, queue_depth, stats):
+    """
+    Start the fetch stage in a background thread. Returns the queue of
+    responses, the stop flag and the thread.
+    """
+    queue = Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    fetcher = threading.Thread(target=_fetchCloudBatches, name='sensortools-cloud-fetch',
+                               args=(batches, client, envelope, queue, stats, stop))
+    fetcher.daemon = True
+    fetcher.start()
+
+    return queue, stop, fetcher
+
+
+def _stopFetcher(queue, stop):
+    """
+    Stop the fetch stage and drain the queue so a blocked put returns
+    """
+    stop.set()
+    while True:
+        try:
+            queue.get_nowait()
+        except Empty:
+            break
+
+
+def _pipelineStats():
+    return {stage: {'batches': 0, 'features': 0, 'seconds': 0.} for stage in ('fetch', 'compute')}
+
+
+def _printPipelineStats(stats):
+    for stage, s in stats.items():
+        rate = s['features'] / s['seconds'] if s['seconds'] else float('nan')
+        print('{}: {} batches, {} features in {:.2f}s ({:.1f} features/s)'.format(
+            stage, s['batches'], s['features'], s['seconds'], rate))
+
+
+def aoiCloudCover(df, aoi, client=None, server_filter=False, queue_depth=2, verbose=False, tolerance=None):
+    """
+    For each footprint in the search results, calculate a percent cloud
+    cover for the AOI (instead of entire strip)
+
+    DUC requests run in a background fetch thread feeding a queue of at most
+    `queue_depth` responses, so the cloud intersections for one batch run
+    while the next batch is in flight. Per-stage throughput is stored in
+    `df.attrs['cloud_pipeline_stats']` and printed if `verbose` is True.
+
+    `client` is a `duc.DUCClient` (or stand-in), defaulting to a process-wide
+    client configured from the environment or ./duc-api.txt. With
+    `server_filter` the AOI envelope is sent as a spatial filter so DUC only
+    returns clouds near the AOI, with reduced fields and precision.
+
+    With `tolerance` (meters) each cloud is simplified before projection and
+    intersection, and an estimated bound on the resulting error of each
+    percent (outline length inside the footprint x tolerance) is stored in
+    `AOI Cloud Cover Error`.
+    """
+    if client is None:
+        client = duc.defaultClient()
+
+    # projection info, projected AOI
+    aoi = spatial_tools.asAOI(aoi)
+
+    # add column to search df
+    df['AOI Cloud Cover'] = 0
+    df['Cloud WKT'] = ''
+    if tolerance:
+        df['AOI Cloud Cover Error'] = 0.
+
+    aoi_footprints = _AOIFootprintCache(df, aoi)
+    envelope = aoi.bounds if server_filter else None
+
+    stats = _pipelineStats()
+    clouds_queue, stop, fetcher = _startFetcher(_cloudCatalogBatches(df), client, envelope, queue_depth, stats)
+    try:
+        while True:
+            clouds = clouds_queue.get()
+            if clouds is _PIPELINE_DONE:
+                break
+            if isinstance(clouds, Exception):
+                raise clouds
+
+            start = time.time()
+            pcts = _cloudFeaturePcts(clouds, aoi_footprints, tolerance)
+            _updateCloudCover(df, pcts)
+            stats['compute']['seconds'] += time.time() - start
+            stats['compute']['batches'] += 1
+            stats['compute']['features'] += len(pcts)
+
+        fetcher.join()
+    finally:
+        _stopFetcher(clouds_queue, stop)
+
+    df.attrs['cloud_pipeline_stats'] = stats
+    if verbose:
+        _printPipelineStats(stats)
 
     return df
+
+
+def _fetchClouds(df, client, envelope, queue_depth, stats):
+    """
+    Fetch the clouds of every catalog id with cloud cover in df, parsing each
+    response while the next one is in flight. Returns the catalog ids and
+    cloud geometries, one per catalog id (the last returned).
+    """
+    clouds_queue, stop, fetcher = _startFetcher(_cloudCatalogBatches(df), client, envelope, queue_depth, stats)
+    clouds = OrderedDict()
+    try:
+        while True:
+            response = clouds_queue.get()
+            if response is _PIPELINE_DONE:
+                break
+            if isinstance(response, Exception):
+                raise response
+
+            start = time.time()
+            features = response.get('features', [])
+            for feature in features:
+                clouds[feature['properties']['image_identifier']] = shapely.geometry.shape(feature['geometry'])
+            stats['compute']['seconds'] += time.time() - start
+            stats['compute']['batches'] += 1
+            stats['compute']['features'] += len(features)
+
+        fetcher.join()
+    finally:
+        _stopFetcher(clouds_queue, stop)
+
+    return list(clouds.keys()), list(clouds.values())
+
+
+def _envelopeClusters(bounds):
+    """
+    Group (minx, miny, maxx, maxy) envelopes into clusters of transitively
+    overlapping envelopes. Returns a list of index lists.
+    """
+    boxes = [shapely.geometry.box(*b) for b in bounds]
+    tree = STRtree(boxes)
+    parent = list(range(len(boxes)))
+
+    def root(j):
+        while parent[j] != j:
+            parent[j] = parent[parent[j]]
+            j = parent[j]
+        return j
+
+    for j, b in enumerate(boxes):
+        for k in tree.query_items(b):
+            parent[root(k)] = root(j)
+
+    clusters = OrderedDict()
+    for j in range(len(boxes)):
+        clusters.setdefault(root(j), []).append(j)
+
+    return list(clusters.values())
+
+
+def aoisCloudCover(dfs, aois, client=None, server_filter=False, queue_depth=2, verbose=False, tolerance=None):
+    """
+    `aoiCloudCover` for many AOIs at once: `dfs` and `aois` are parallel
+    lists of search results and their AOIs, updated with the same columns.
+
+    Every catalog id is fetched from DUC exactly once, whichever AOIs share
+    it, and the clouds are indexed in an STRtree. With `server_filter`, AOIs
+    are grouped into clusters of overlapping envelopes and catalog ids are
+    requested with the envelope of the clusters that need them, so far apart
+    AOIs do not pull every cloud in between. Each AOI then only intersects
+    the clouds of its own catalog ids that touch it. Returns the list of
+    updated dfs.
+
+    Example
+    -------
+    dfs = gbdxaoi.aoisCloudCover(dfs, aois, client=client, server_filter=True)
+    """
+    if len(dfs) != len(aois):
+        raise InputError('aoisCloudCover needs one search results df per AOI')
+    if not dfs:
+        return dfs
+    if client is None:
+        client = duc.defaultClient()
+
+    aois = [spatial_tools.asAOI(aoi) for aoi in aois]
+    for df in dfs:
+        df['AOI Cloud Cover'] = 0
+        df['Cloud WKT'] = ''
+        if tolerance:
+            df['AOI Cloud Cover Error'] = 0.
+
+    if server_filter:
+        clusters = _envelopeClusters([aoi.bounds for aoi in aois])
+    else:
+        clusters = [list(range(len(aois)))]
+
+    # the clusters needing each catalog id, which is requested once with
+    # the envelope around all of them
+    needs = OrderedDict()
+    for n, members in enumerate(clusters):
+        for j in members:
+            for c, cover in zip(dfs[j]['catalog_id'].values, dfs[j]['Cloud Cover'].values):
+                needs.setdefault(c, [cover, set()])[1].add(n)
+    requests = OrderedDict()
+    for c, (cover, cluster_ids) in needs.items():
+        requests.setdefault(tuple(sorted(cluster_ids)), []).append((c, cover))
+
+    stats = _pipelineStats()
+    catids, clouds_shp = [], []
+    for cluster_ids, rows in requests.items():
+        envelope = None
+        if server_filter:
+            bounds = np.array([aois[j].bounds for n in cluster_ids for j in clusters[n]])
+            envelope = (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+        catalog = pd.DataFrame(rows, columns=['catalog_id', 'Cloud Cover'])
+        fetched_ids, fetched_shp = _fetchClouds(catalog, client, envelope, queue_depth, stats)
+        catids.extend(fetched_ids)
+        clouds_shp.extend(fetched_shp)
+    tree = STRtree(clouds_shp) if clouds_shp else None
+
+    start = time.time()
+    index = {c: k for k, c in enumerate(catids)}
+    for df, aoi in zip(dfs, aois):
+        if tree is None:
+            break
+        wanted = set(index[c] for c in df['catalog_id'].values if c in index)
+        if server_filter:
+            # only the clouds DUC returns for this AOI's own envelope
+            aoi_envelope = shapely.geometry.box(*aoi.bounds)
+            wanted = set(k for k in tree.query_items(aoi_envelope)
+                         if k in wanted and clouds_shp[k].intersects(aoi_envelope))
+        hits = [k for k in tree.query_items(aoi.geometry)
+                if k in wanted and not aoi.prepared.disjoint(clouds_shp[k])]
+        pcts = _cloudPcts([catids[k] for k in hits], [clouds_shp[k] for k in hits],
+                          _AOIFootprintCache(df, aoi), tolerance)
+        # clouds missing the AOI keep their WKT with a cloud cover of 0
+        pcts += [(catids[k], 0., clouds_shp[k].wkt, 0.) for k in sorted(wanted.difference(hits))]
+        _updateCloudCover(df, pcts)
+    stats['compute']['seconds'] += time.time() - start
+
+    for df in dfs:
+        df.attrs['cloud_pipeline_stats'] = stats
+
+    if verbose:
+        print('{} AOIs in {} clusters, {} catalog ids, {} clouds'.format(
+            len(aois), len(clusters), len(needs), len(catids)))
+        _printPipelineStats(stats)
+
+    return dfs
@@ -65,13 +65,14 @@ def searchScatterPlot(df):
     ax.xaxis.set_major_formatter(yearsFmt)
     ax.xaxis.set_minor_locator(months)
 
-    s = df.groupby(['Sensor']).count()
+    s = df.groupby(['Sensor']).size()
+    s = s[s > 0]
 
-    _ = ax.set_yticklabels(s.index + ' Count: ' + s.x.map(str))
+    _ = ax.set_yticklabels(s.index.astype(str) + ' Count: ' + s.map(str))
     _ = ax.get_yaxis().set_visible(False)
 
     legend = ax.legend(loc='upper center', bbox_to_anchor=(0.5, 1.1), ncol=len(s.index))
     for t in legend.get_texts():
-        c = s[s.index == t.get_text()].x.values[0]
+        c = s[s.index == t.get_text()].values[0]
         label = t.get_text() + ' Count:' + str(c)
         t.set_text(label)
@@ -0,0 +1,205 @@
+import pandas as pd
+import numpy as np
+
+
+class _SearchIndex(object):
+    """
+    Typed, date-sorted columnar view of formatted search results. Built once
+    per DataFrame and shared by every query derived from it.
+    """
+    _columns = {
+        'cloud': 'Cloud Cover',
+        'nadir': 'Off Nadir Angle',
+        'sun': 'Sun Elevation',
+        'overlap': 'Footprint AOI Inter Percent',
+    }
+
+    def __init__(self, df):
+        self.df = df
+
+        dates = pd.DatetimeIndex(df['Date'] if 'Date' in df.columns else df.index)
+        self.tz = dates.tz
+        # stable sort so rows sharing a timestamp keep their original order
+        self.order = np.argsort(dates.asi8, kind='mergesort')
+        self.dates = dates.asi8[self.order]
+
+        sensors = pd.Categorical(np.asarray(df['Sensor'])[self.order])
+        self.sensor_codes = sensors.codes
+        self.sensor_categories = list(sensors.categories)
+
+        self.values = {}
+        for key, column in self._columns.items():
+            if column in df.columns:
+                self.values[key] = pd.to_numeric(df[column], errors='coerce').values[self.order].astype(np.float64)
+
+        self.masks = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _timestamp(self, ts):
+        ts = pd.Timestamp(ts)
+        if self.tz is not None and ts.tzinfo is None:
+            ts = ts.tz_localize('UTC')
+        elif self.tz is None and ts.tzinfo is not None:
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        return ts.value
+
+    def mask(self, key):
+        """
+        Return the cached boolean mask for a predicate key, computing it on first use
+        """
+        try:
+            return self.masks[key]
+        except KeyError:
+            pass
+
+        kind = key[0]
+        if kind == 'sensor':
+            codes = [self.sensor_categories.index(s) for s in key[1] if s in self.sensor_categories]
+            m = np.isin(self.sensor_codes, codes)
+        elif kind == 'date':
+            start, end = key[1], key[2]
+            lo = 0 if start is None else np.searchsorted(self.dates, self._timestamp(start), side='left')
+            hi = len(self.dates) if end is None else np.searchsorted(self.dates, self._timestamp(end), side='right')
+            m = np.zeros(len(self.dates), dtype=bool)
+            m[lo:hi] = True
+        elif kind == 'range':
+            column, low, high = key[1], key[2], key[3]
+            values = self.values[column]
+            m = np.ones(len(values), dtype=bool)
+            if low is not None:
+                m &= values >= low
+            if high is not None:
+                m &= values <= high
+        else:
+            m = np.logical_and.reduce([self.mask(k) for k in key[1]])
+
+        m.flags.writeable = False
+        self.masks[key] = m
+        return m
+
+
+class SearchQuery(object):
+    """
+    Composable filter over the output of `gbdxaoi.formatSearchResults`.
+
+    Each predicate returns a new query, so filters can be chained and reused.
+    Masks are computed over typed numpy columns and cached, so repeated
+    queries built from the same root query do not recompute shared predicates.
+
+    Example
+    -------
+    from sensortools.query import SearchQuery
+    q = SearchQuery(df)
+    wv3 = q.sensor('WORLDVIEW03_VNIR').cloudCover(max=20)
+    wv3.dateRange('2017-01-01', '2018-01-01').results()
+    """
+
+    def __init__(self, df, _index=None, _keys=()):
+        self._index = _index if _index is not None else _SearchIndex(df)
+        self._keys = tuple(_keys)
+
+    def _add(self, key):
+        if key in self._keys:
+            return self
+        return SearchQuery(None, _index=self._index, _keys=self._keys + (key,))
+
+    def sensor(self, *sensors):
+        """
+        Keep results from any of the given sensors
+        """
+        return self._add(('sensor', tuple(sorted(sensors))))
+
+    def dateRange(self, start=None, end=None):
+        """
+        Keep results acquired between start and end (inclusive)
+        """
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        return self._add(('date', start, end))
+
+    def _between(self, column, min, max):
+        if column not in self._index.values:
+            raise KeyError('Search results are missing the {} column'.format(_SearchIndex._columns[column]))
+        return self._add(('range', column, min, max))
+
+    def cloudCover(self, min=None, max=None):
+        """
+        Keep results with strip cloud cover between min and max percent
+        """
+        return self._between('cloud', min, max)
+
+    def offNadir(self, min=None, max=None):
+        """
+        Keep results with an off nadir angle between min and max degrees
+        """
+        return self._between('nadir', min, max)
+
+    def sunElevation(self, min=None, max=None):
+        """
+        Keep results with a sun elevation between min and max degrees
+        """
+        return self._between('sun', min, max)
+
+    def aoiOverlap(self, min=None, max=None):
+        """
+        Keep results whose footprint covers between min and max percent of the AOI
+        """
+        return self._between('overlap', min, max)
+
+    def __and__(self, other):
+        if other._index is not self._index:
+            raise ValueError('Only queries built from the same SearchQuery can be combined')
+        q = self
+        for key in other._keys:
+            q = q._add(key)
+        return q
+
+    def mask(self):
+        """
+        Boolean mask of matching rows, in date order
+        """
+        if not self._keys:
+            return np.ones(len(self._index), dtype=bool)
+        if len(self._keys) == 1:
+            return self._index.mask(self._keys[0])
+        return self._index.mask(('and', tuple(sorted(self._keys, key=repr))))
+
+    def positions(self):
+        """
+        Integer row positions of the matching rows in the original DataFrame
+        """
+        return self._index.order[self.mask()]
+
+    def results(self):
+        """
+        Return the matching rows of the original DataFrame, sorted by date
+        """
+        return self._index.df.iloc[self.positions()]
+
+    def __len__(self):
+        return int(np.count_nonzero(self.mask()))
+
+
+def filterSearchResults(df, sensor=None, start=None, end=None, max_cloud=None,
+                        max_off_nadir=None, min_sun_elevation=None, min_aoi_overlap=None):
+    """
+    Filter formatted search results in one call. For repeated filtering of
+    the same results, build a `SearchQuery` once and reuse it.
+    """
+    q = SearchQuery(df)
+    if sensor is not None:
+        q = q.sensor(*([sensor] if isinstance(sensor, str) else sensor))
+    if start is not None or end is not None:
+        q = q.dateRange(start, end)
+    if max_cloud is not None:
+        q = q.cloudCover(max=max_cloud)
+    if max_off_nadir is not None:
+        q = q.offNadir(max=max_off_nadir)
+    if min_sun_elevation is not None:
+        q = q.sunElevation(min=min_sun_elevation)
+    if min_aoi_overlap is not None:
+        q = q.aoiOverlap(min=min_aoi_overlap)
+
+    return q.results()
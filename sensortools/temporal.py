@@ -0,0 +1,219 @@
+from sensortools.decorators import InputError
+import pandas as pd
+import numpy as np
+
+
+# Weighting of each acquisition by a formatted search results column, as the
+# fraction of the AOI it usefully images
+WEIGHTS = {
+    'Footprint AOI Inter Percent': lambda v: v / 100.,
+    'AOI Cloud Cover': lambda v: 1. - v / 100.,
+}
+
+_DAY_SECONDS = 86400.
+
+
+def _acquisitions(df, by='Sensor', weight=None):
+    """
+    Acquisition times sorted by group then date, as int64 seconds, with the
+    group codes and names and the acquisition weights. Image parts sharing
+    a catalog id count as one acquisition, keeping the best weighted part;
+    rows without a catalog id are keyed by their image identifier.
+    """
+    if weight is not None and weight not in WEIGHTS:
+        raise InputError('weight must be one of {}'.format(', '.join(WEIGHTS)))
+    if weight is not None and weight not in df.columns:
+        raise InputError('weight column {} is not in the search results'.format(weight))
+
+    if weight is None:
+        w = np.ones(len(df))
+    else:
+        w = np.clip(WEIGHTS[weight](df[weight].values.astype(float)), 0., 1.)
+
+    if 'catalog_id' in df.columns and len(df):
+        # rows without a catalog id fall back to their image identifier, or
+        # stay separate acquisitions
+        key = df['catalog_id']
+        if 'image_identifier' in df.columns:
+            key = key.where(key.notnull(), df['image_identifier'])
+        ids = pd.factorize(key)[0]
+        missing = ids < 0
+        ids[missing] = ids.max() + 1 + np.arange(missing.sum())
+        # keep each catalog id's highest weight
+        best = np.lexsort((-w, ids))
+        first = np.ones(len(best), dtype=bool)
+        first[1:] = ids[best][1:] != ids[best][:-1]
+        keep = best[first]
+    else:
+        keep = np.arange(len(df))
+
+    dates = pd.DatetimeIndex(df['Date'].values[keep])
+    if dates.tz is not None:
+        dates = dates.tz_convert('UTC').tz_localize(None)
+    seconds = dates.asi8 // 10 ** 9
+    codes, names = pd.factorize(df[by].values[keep], sort=True)
+
+    order = np.lexsort((seconds, codes))
+
+    return codes[order], np.asarray(names), seconds[order], w[keep][order]
+
+
+def _groupStarts(codes, n_groups):
+    return np.searchsorted(codes, np.arange(n_groups + 1))
+
+
+def _windowSeconds(window):
+    return pd.Timedelta(window).total_seconds()
+
+
+def _rollingCounts(codes, seconds, weights, window):
+    """
+    Number and summed weight of the acquisitions of the same group in the
+    `window` up to and including each acquisition
+    """
+    # offset each group's times so a single searchsorted never crosses groups
+    span = float(seconds.max() - seconds.min()) + window + 1. if len(seconds) else 0.
+    key = (seconds - (seconds.min() if len(seconds) else 0)).astype(float) + codes * span
+    start = np.searchsorted(key, key - window, side='right')
+    end = np.arange(1, len(key) + 1)
+    cum = np.concatenate([[0.], np.cumsum(weights)])
+
+    return end - start, cum[end] - cum[start]
+
+
+def _groupPercentiles(codes, values, weights, n_groups, percentiles):
+    """
+    Percentiles of `values` within each group, linearly interpolated as in
+    np.percentile when unweighted, or the weighted percentile otherwise
+    """
+    out = np.full((n_groups, len(percentiles)), np.nan)
+    if not len(values):
+        return out
+
+    order = np.lexsort((values, codes))
+    codes, values, weights = codes[order], values[order], weights[order]
+    starts = _groupStarts(codes, n_groups)
+    counts = np.diff(starts)
+    has = counts > 0
+    q = np.asarray(percentiles, dtype=float) / 100.
+
+    if np.all(weights == weights[0]):
+        pos = q[None, :] * (counts[has, None] - 1)
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, counts[has, None] - 1)
+        base = starts[:-1][has, None]
+        frac = pos - lo
+        out[has] = values[base + lo] * (1 - frac) + values[base + hi] * frac
+        return out
+
+    # cumulative weight fraction within each group, offset by the group code
+    # so one searchsorted covers every group
+    cum = np.concatenate([[0.], np.cumsum(weights)])
+    group_base = cum[starts[:-1]]
+    total = cum[starts[1:]] - group_base
+    cum = cum[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = (cum - group_base[codes]) / total[codes]
+    frac = np.nan_to_num(frac) + codes * 2.
+    targets = q[None, :] + np.arange(n_groups)[:, None] * 2.
+    idx = np.searchsorted(frac, targets[has] - 1e-12, side='left')
+    idx = np.minimum(idx, starts[1:][has, None] - 1)
+    out[has] = values[idx]
+
+    return out
+
+
+def _groupMax(codes, values, n_groups):
+    out = np.zeros(n_groups, dtype=np.asarray(values).dtype)
+    np.maximum.at(out, codes, values)
+
+    return out
+
+
+def acquisitionCounts(df, window='30D', by='Sensor', weight=None):
+    """
+    Rolling acquisition counts: for every acquisition, the number of
+    acquisitions of the same sensor in the trailing `window` (a pandas
+    offset such as '30D'), including itself. With a `weight` column the
+    summed weights are returned as well.
+
+    Returns
+    -------
+    df
+        one row per acquisition, sorted by sensor and date, with `by`, 'Date',
+        'Weight', 'Acquisitions' and 'Weighted Acquisitions'
+    """
+    codes, names, seconds, weights = _acquisitions(df, by, weight)
+    counts, weighted = _rollingCounts(codes, seconds, weights, _windowSeconds(window))
+
+    return pd.DataFrame({
+        by: names[codes] if len(codes) else np.array([], dtype=object),
+        'Date': pd.to_datetime(seconds, unit='s'),
+        'Weight': weights,
+        'Acquisitions': counts,
+        'Weighted Acquisitions': weighted})
+
+
+def revisitStats(df, by='Sensor', weight=None, percentiles=(10, 25, 50, 75, 90), window='30D'):
+    """
+    Revisit statistics per sensor: acquisition counts, the gaps in days
+    between consecutive acquisitions (mean and percentiles) and the mean and
+    max number of acquisitions in a trailing `window`.
+
+    Image parts sharing a catalog id are one acquisition. With `weight`
+    ('Footprint AOI Inter Percent' or 'AOI Cloud Cover'), each acquisition
+    counts by the fraction of the AOI it images (or images cloud free): gap
+    percentiles are weighted by the acquisition closing each gap, and
+    weighted acquisition counts are added.
+
+    Filter the search results first to ask e.g. for the median WV03 revisit
+    with less than 20% cloud.
+
+    Example
+    -------
+    from sensortools import temporal
+    from sensortools.query import SearchQuery
+    wv3 = SearchQuery(df).sensor('WORLDVIEW03_VNIR').cloudCover(max=20).results()
+    temporal.revisitStats(wv3)
+    """
+    codes, names, seconds, weights = _acquisitions(df, by, weight)
+    n_groups = len(names)
+    starts = _groupStarts(codes, n_groups)
+
+    # gaps between consecutive acquisitions of the same group
+    same = codes[1:] == codes[:-1]
+    gaps = np.diff(seconds)[same] / _DAY_SECONDS
+    gap_codes = codes[1:][same]
+    gap_weights = weights[1:][same]
+
+    gap_counts = np.bincount(gap_codes, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_gap = np.bincount(gap_codes, weights=gaps * gap_weights, minlength=n_groups) / \
+            np.bincount(gap_codes, weights=gap_weights, minlength=n_groups)
+    mean_gap[gap_counts == 0] = np.nan
+    pcts = _groupPercentiles(gap_codes, gaps, gap_weights, n_groups, percentiles)
+
+    counts, weighted = _rollingCounts(codes, seconds, weights, _windowSeconds(window))
+    n = np.diff(starts)
+    has = n > 0
+    first = np.full(n_groups, np.nan)
+    last = np.full(n_groups, np.nan)
+    first[has] = seconds[starts[:-1][has]]
+    last[has] = seconds[starts[1:][has] - 1]
+
+    stats = pd.DataFrame({
+        'Acquisitions': n,
+        'Effective Acquisitions': np.bincount(codes, weights=weights, minlength=n_groups),
+        'First': pd.to_datetime(first, unit='s'),
+        'Last': pd.to_datetime(last, unit='s'),
+        'Mean Gap (days)': mean_gap},
+        index=pd.Index(names, name=by))
+    for j, p in enumerate(percentiles):
+        stats['P{:g} Gap (days)'.format(p)] = pcts[:, j]
+    stats['Mean Acquisitions per {}'.format(window)] = np.bincount(codes, weights=counts, minlength=n_groups) / \
+        np.maximum(n, 1)
+    stats['Max Acquisitions per {}'.format(window)] = _groupMax(codes, counts, n_groups)
+    if weight is not None:
+        stats['Max Weighted Acquisitions per {}'.format(window)] = _groupMax(codes, weighted, n_groups)
+
+    return stats
@@ -0,0 +1,92 @@
+from sensortools.tools.spatial import _flatten_rings
+import numpy as np
+
+
+def grid_for_bounds(bounds, cell_size):
+    """
+    Define a grid of `cell_size` cells, aligned to multiples of the cell size,
+    covering projected (minx, miny, maxx, maxy) bounds
+
+    Returns
+    -------
+    (x0, y0), (rows, cols)
+        top left corner of the grid and its shape
+    """
+    minx, miny, maxx, maxy = bounds
+    x0 = np.floor(minx / cell_size) * cell_size
+    y0 = np.ceil(maxy / cell_size) * cell_size
+    cols = max(int(np.ceil((maxx - x0) / cell_size)), 1)
+    rows = max(int(np.ceil((y0 - miny) / cell_size)), 1)
+
+    return (x0, y0), (rows, cols)
+
+
+def polygon_window_mask(shp, origin, cell_size, shape):
+    """
+    Rasterize a projected (Multi)Polygon with vectorized even-odd scanline
+    filling. A cell is covered when its center falls inside the polygon.
+
+    Only the window of the grid covering the polygon's bounds is filled.
+
+    Returns
+    -------
+    window, mask
+        (row slice, col slice) of the window and its boolean mask, or
+        (None, None) if the polygon misses the grid
+    """
+    x0, y0 = origin
+    rows, cols = shape
+    if shp is None or shp.is_empty:
+        return None, None
+
+    minx, miny, maxx, maxy = shp.bounds
+    r0 = max(int(np.floor((y0 - maxy) / cell_size)), 0)
+    r1 = min(int(np.ceil((y0 - miny) / cell_size)), rows)
+    c0 = max(int(np.floor((minx - x0) / cell_size)), 0)
+    c1 = min(int(np.ceil((maxx - x0) / cell_size)), cols)
+    if r0 >= r1 or c0 >= c1:
+        return None, None
+
+    x, y, offsets, _, _ = _flatten_rings([shp])
+    if not len(x):
+        return None, None
+
+    # every ring edge, excluding the jumps between rings
+    valid = np.ones(len(x) - 1, dtype=bool)
+    valid[offsets[1:-1] - 1] = False
+    xa, ya, xb, yb = x[:-1][valid], y[:-1][valid], x[1:][valid], y[1:][valid]
+
+    # window rows whose centers each edge crosses, half open in y so vertices
+    # on a scanline are counted once
+    ylo, yhi = np.minimum(ya, yb), np.maximum(ya, yb)
+    first = np.maximum(np.ceil((y0 - yhi) / cell_size - 0.5), r0).astype(int)
+    last = np.minimum(np.floor((y0 - ylo) / cell_size - 0.5), r1 - 1).astype(int)
+    centers_first = y0 - (first + 0.5) * cell_size
+    first += (centers_first >= yhi)
+    centers_last = y0 - (last + 0.5) * cell_size
+    last -= (centers_last < ylo)
+    n = np.maximum(last - first + 1, 0)
+    if not n.sum():
+        return None, None
+
+    edge = np.repeat(np.arange(len(n)), n)
+    row = np.repeat(first, n) + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n))
+    yc = y0 - (row + 0.5) * cell_size
+    xc = xa[edge] + (yc - ya[edge]) * (xb[edge] - xa[edge]) / (yb[edge] - ya[edge])
+
+    # sort crossings by row then x and pair them into spans
+    order = np.lexsort((xc, row))
+    row, xc = row[order], xc[order]
+    span_row, xs, xe = row[0::2], xc[0::2], xc[1::2]
+
+    # columns whose centers fall inside each span
+    cs = np.clip(np.ceil((xs - x0) / cell_size - 0.5).astype(int), c0, c1)
+    ce = np.clip(np.floor((xe - x0) / cell_size - 0.5).astype(int) + 1, c0, c1)
+    keep = ce > cs
+
+    diff = np.zeros((r1 - r0, c1 - c0 + 1), dtype=np.int32)
+    np.add.at(diff, (span_row[keep] - r0, cs[keep] - c0), 1)
+    np.add.at(diff, (span_row[keep] - r0, ce[keep] - c0), -1)
+    mask = np.cumsum(diff, axis=1)[:, :-1] > 0
+
+    return (slice(r0, r1), slice(c0, c1)), mask
@@ -1,10 +1,31 @@
-from sensortools.decorators import ingest_wkt, ingest_latlon
+from sensortools.decorators import ingest_wkt, ingest_latlon, InputError
 from functools import partial
 import shapely
 from shapely.ops import transform
+from shapely.prepared import prep
 import shapely.wkt
+import pandas as pd
+import numpy as np
 import pyproj
-import utm
+
+
+# Ellipsoid used for geodesic area calculations
+_GEOD = pyproj.Geod(ellps='WGS84')
+
+# Maximum edge length (degrees) before an edge is densified for geodesic area.
+# WKT edges are straight lines in lon/lat, not geodesics, so long edges are
+# split to follow the lon/lat line closely.
+GEODESIC_DENSIFY_DEG = 0.5
+
+# Meters per degree used to turn a metric tolerance into degrees: the length
+# of a degree of latitude at the poles, the longest degree of latitude or
+# longitude on the WGS84 ellipsoid, so the simplification error in meters
+# stays within the requested tolerance.
+METERS_PER_DEGREE = 111694.
+
+# Area backends for aoiArea, the default can be changed with setAreaMethod
+AREA_METHODS = ('utm', 'geodesic')
+AREA_METHOD = 'utm'
 
 
 @ingest_wkt
@@ -21,11 +42,84 @@ def convertAOItoLocation(aoi):
     return [y, x]
 
 
+def setAreaMethod(method):
+    """
+    Set the default backend used by `aoiArea` and `aoiAreas`:
+    'utm' (project into the centroid's UTM zone) or 'geodesic' (WGS84 ellipsoid)
+    """
+    global AREA_METHOD
+    AREA_METHOD = _area_method(method)
+
+
+def _area_method(method):
+    method = AREA_METHOD if method is None else method
+    if method not in AREA_METHODS:
+        raise InputError('area method must be one of {}'.format(', '.join(AREA_METHODS)))
+    return method
+
+
+def simplifyErrorBound(shp, tolerance):
+    """
+    Bound on the area error in km2 of simplifying a shapely geometry in 4326
+    to `tolerance` meters: perimeter x tolerance
+    """
+    if not tolerance:
+        return 0.
+    # the degree perimeter scaled by METERS_PER_DEGREE is never shorter than
+    # the true perimeter
+    return shp.length * METERS_PER_DEGREE * tolerance / 1000000.
+
+
+def _partCount(shp):
+    return len(shp.geoms) if hasattr(shp, 'geoms') else 1
+
+
+def simplifyGeometry(shp, tolerance):
+    """
+    Simplify a shapely geometry in 4326 so no vertex moves more than
+    `tolerance` meters. Returns the simplified geometry and a bound on the
+    area error in km2, see `simplifyErrorBound`.
+    """
+    if not tolerance:
+        return shp, 0.
+
+    # Douglas-Peucker is much faster than the topology preserving variant,
+    # which is only run for polygons it leaves self-intersecting or split
+    # into a different number of parts: repairing those with buffer(0)
+    # (which GEOS may already have done) can drop a whole lobe, far outside
+    # the bound
+    simplified = shp.simplify(tolerance / METERS_PER_DEGREE, preserve_topology=False)
+    if simplified.is_empty:
+        simplified = shp
+    elif simplified.geom_type in ('Polygon', 'MultiPolygon') and \
+            (not simplified.is_valid or _partCount(simplified) != _partCount(shp)):
+        simplified = shp.simplify(tolerance / METERS_PER_DEGREE, preserve_topology=True)
+
+    return simplified, simplifyErrorBound(shp, tolerance)
+
+
 @ingest_wkt
-def aoiArea(aoi):
+def aoiArea(aoi, method=None, tolerance=None, return_error=False):
     """
-    Get the area of a WKT in 4326
+    Get the area of a WKT in 4326, in km2. `method` selects the area backend,
+    defaulting to the one set with `setAreaMethod`. With `tolerance` (meters)
+    the geometry is simplified first; `return_error` returns (area, bound on
+    the area error in km2), see `simplifyGeometry`.
     """
+    error_km2 = 0.
+    if tolerance:
+        simplified, error_km2 = simplifyGeometry(shapely.wkt.loads(aoi), tolerance)
+        aoi = simplified.wkt
+
+    km2 = _aoiArea(aoi, method)
+
+    return (km2, error_km2) if return_error else km2
+
+
+def _aoiArea(aoi, method=None):
+    if _area_method(method) == 'geodesic':
+        return geodesicArea(aoi)
+
     shp = shapely.wkt.loads(aoi)
     to_p = getUTMProj(aoi)
     from_p = pyproj.Proj(init='epsg:4326')
@@ -38,6 +132,340 @@ def aoiArea(aoi):
     return km2
 
 
+def aoiAreas(aois, method=None):
+    """
+    Get the area in km2 of many WKTs in 4326 as a numpy array. With the
+    geodesic backend all rings are unwrapped and densified in one batch.
+    """
+    aois = list(aois)
+    for aoi in aois:
+        if not isinstance(aoi, str):
+            raise InputError('Input into aoiAreas function must be WKT strings')
+
+    if _area_method(method) == 'geodesic':
+        return _geodesic_areas([shapely.wkt.loads(aoi) for aoi in aois]) / 1000000.
+
+    return np.array([aoiArea(aoi, method='utm') for aoi in aois], dtype=float)
+
+
+def _flatten_rings(shps):
+    """
+    Flatten the polygon rings of many shapely geometries into coordinate arrays.
+
+    Returns lon, lat, ring offsets into the coordinate arrays, the geometry
+    index of each ring and whether each ring is a hole
+    """
+    coords, geom_idx, holes = [], [], []
+
+    def add(shp, j):
+        if shp.geom_type == 'Polygon':
+            if shp.is_empty:
+                return
+            for k, ring in enumerate([shp.exterior] + list(shp.interiors)):
+                coords.append(np.asarray(ring.coords)[:, :2])
+                geom_idx.append(j)
+                holes.append(k > 0)
+        elif hasattr(shp, 'geoms'):
+            for g in shp.geoms:
+                add(g, j)
+
+    for j, shp in enumerate(shps):
+        add(shp, j)
+
+    if not coords:
+        empty = np.zeros(0)
+        return empty, empty, np.zeros(1, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=bool)
+
+    offsets = np.concatenate([[0], np.cumsum([len(c) for c in coords])])
+    xy = np.concatenate(coords)
+    return xy[:, 0], xy[:, 1], offsets, np.array(geom_idx), np.array(holes)
+
+
+def _simpleFootprint(wkt):
+    """
+    Coordinate text of a single ring (MULTI)POLYGON WKT, None for anything else
+    """
+    start = wkt.find('(')
+    if start < 0 or wkt[:start].strip().upper() not in ('POLYGON', 'MULTIPOLYGON'):
+        return None
+    body = wkt[start:].strip().lstrip('(').rstrip(')')
+    if '(' in body or ')' in body:
+        return None
+    return body
+
+
+def parseFootprints(wkts):
+    """
+    Parse many footprint WKTs into flat coordinate arrays in one pass.
+
+    Single ring POLYGONs and MULTIPOLYGONs (almost every catalog footprint)
+    are parsed from their text directly. Anything else (several rings or
+    parts, 3D coordinates, ...) falls back to shapely.
+
+    Returns
+    -------
+    lon, lat, offsets, geom_idx, holes
+        as `_flatten_rings`: coordinates, ring offsets into them, the
+        footprint index of each ring and whether each ring is a hole
+    """
+    wkts = list(wkts)
+    bodies = [_simpleFootprint(wkt) for wkt in wkts]
+    simple = np.array([b is not None for b in bodies], dtype=bool)
+
+    simple_idx = np.flatnonzero(simple)
+    counts = np.array([bodies[j].count(',') + 1 for j in simple_idx], dtype=int)
+    if len(simple_idx):
+        text = ','.join(bodies[j] for j in simple_idx)
+        try:
+            values = np.array(text.replace(',', ' ').split(), dtype=float)
+        except ValueError:
+            values = np.zeros(0)
+        if len(values) != 2 * counts.sum():
+            # e.g. 3D coordinates, leave them all to shapely
+            simple[:] = False
+            simple_idx, counts, values = simple_idx[:0], counts[:0], np.zeros(0)
+    else:
+        values = np.zeros(0)
+
+    complex_idx = np.flatnonzero(~simple)
+    c_lon, c_lat, c_offsets, c_geom, c_holes = _flatten_rings([shapely.wkt.loads(wkts[j]) for j in complex_idx])
+    if not len(complex_idx):
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return values[0::2], values[1::2], offsets, simple_idx, np.zeros(len(simple_idx), dtype=bool)
+
+    # merge the rings of both paths back into footprint order
+    ring_geom = np.concatenate([simple_idx, complex_idx[c_geom]])
+    ring_len = np.concatenate([counts, np.diff(c_offsets)])
+    ring_start = np.concatenate([np.cumsum(counts) - counts, len(values) // 2 + c_offsets[:-1]])
+    ring_holes = np.concatenate([np.zeros(len(simple_idx), dtype=bool), c_holes])
+    order = np.argsort(ring_geom, kind='mergesort')
+
+    lon = np.concatenate([values[0::2], c_lon])
+    lat = np.concatenate([values[1::2], c_lat])
+    ring_len = ring_len[order]
+    take = np.repeat(ring_start[order] - np.cumsum(ring_len) + ring_len, ring_len) + np.arange(ring_len.sum())
+
+    return lon[take], lat[take], np.concatenate([[0], np.cumsum(ring_len)]), ring_geom[order], ring_holes[order]
+
+
+def _ring_shoelace(x, y, offsets):
+    """
+    Signed shoelace sums of closed rings: twice the area, and the x and y
+    centroid moments (times 6)
+    """
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    mx = (x[:-1] + x[1:]) * cross
+    my = (y[:-1] + y[1:]) * cross
+    # the terms between rings are not edges
+    cross[offsets[1:-1] - 1] = 0.
+    mx[offsets[1:-1] - 1] = 0.
+    my[offsets[1:-1] - 1] = 0.
+
+    starts = offsets[:-1]
+    if not len(cross):
+        zeros = np.zeros(len(starts))
+        return zeros, zeros, zeros
+    return np.add.reduceat(cross, starts), np.add.reduceat(mx, starts), np.add.reduceat(my, starts)
+
+
+def _ring_signs(cross, holes):
+    # outer rings add area and holes remove it, whatever their orientation
+    return np.where(holes, -1., 1.) * np.where(cross < 0, -1., 1.)
+
+
+def footprintStats(wkts, method=None):
+    """
+    Centroids, bounds, UTM zones and areas (km2) of many footprint WKTs in
+    4326, computed on the flat arrays of `parseFootprints` rather than one
+    shapely geometry per footprint. `method` selects the area backend as in
+    `aoiArea`: each footprint is measured in the UTM zone of its centroid
+    (one transform per zone), or on the ellipsoid.
+
+    Returns
+    -------
+    df
+        one row per WKT with 'Centroid X', 'Centroid Y', 'Min X', 'Min Y',
+        'Max X', 'Max Y', 'UTM Zone', 'Hemisphere' and 'Area (km2)'
+    """
+    method = _area_method(method)
+    wkts = list(wkts)
+    n = len(wkts)
+    lon, lat, offsets, geom_idx, holes = parseFootprints(wkts)
+    ring_len = np.diff(offsets)
+
+    # bounds, the rings of each footprint are contiguous
+    bounds = np.full((n, 4), np.nan)
+    has = np.bincount(geom_idx, minlength=n) > 0
+    if len(lon):
+        geom_starts = offsets[:-1][np.searchsorted(geom_idx, np.flatnonzero(has))]
+        bounds[has, 0] = np.minimum.reduceat(lon, geom_starts)
+        bounds[has, 1] = np.minimum.reduceat(lat, geom_starts)
+        bounds[has, 2] = np.maximum.reduceat(lon, geom_starts)
+        bounds[has, 3] = np.maximum.reduceat(lat, geom_starts)
+
+    # area weighted centroids in degrees, as shapely computes them
+    cross, mx, my = _ring_shoelace(lon, lat, offsets)
+    sign = _ring_signs(cross, holes)
+    area2 = np.bincount(geom_idx, weights=cross * sign, minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cx = np.bincount(geom_idx, weights=mx * sign, minlength=n) / (3. * area2)
+        cy = np.bincount(geom_idx, weights=my * sign, minlength=n) / (3. * area2)
+
+    zones = np.zeros(n, dtype=int)
+    hemispheres = np.full(n, '', dtype=object)
+    ok = has & np.isfinite(cx) & np.isfinite(cy)
+    if ok.any():
+        z, h = utmZones(cy[ok], cx[ok])
+        zones[ok], hemispheres[ok] = z, h
+
+    if method == 'geodesic':
+        km2 = _geodesic_ring_areas(lon, lat, offsets, geom_idx, holes, n) / 1000000.
+    else:
+        coord_geom = np.repeat(geom_idx, ring_len)
+        x, y = np.zeros(len(lon)), np.zeros(len(lat))
+        from_p = pyproj.Proj(init='epsg:4326')
+        epsg = np.where(hemispheres == 'south', 32700, 32600) + zones
+        for code in np.unique(epsg[ok]):
+            members = ok & (epsg == code)
+            j = np.flatnonzero(members)[0]
+            to_utm = pyproj.Transformer.from_proj(from_p, _utm_proj(zones[j], hemispheres[j]), always_xy=True)
+            pts = members[coord_geom]
+            x[pts], y[pts] = to_utm.transform(lon[pts], lat[pts])
+        utm_cross, _, _ = _ring_shoelace(x, y, offsets)
+        km2 = np.abs(np.bincount(geom_idx, weights=utm_cross * _ring_signs(utm_cross, holes), minlength=n)) \
+            / 2. / 1000000.
+        km2[~ok] = 0.
+
+    return pd.DataFrame({
+        'Centroid X': cx,
+        'Centroid Y': cy,
+        'Min X': bounds[:, 0],
+        'Min Y': bounds[:, 1],
+        'Max X': bounds[:, 2],
+        'Max Y': bounds[:, 3],
+        'UTM Zone': zones,
+        'Hemisphere': hemispheres,
+        'Area (km2)': km2})
+
+
+def _densify_rings(lon, lat, offsets, step=GEODESIC_DENSIFY_DEG):
+    """
+    Unwrap closed lon/lat rings across the antimeridian and densify their
+    edges so that no edge spans more than `step` degrees. The closing vertex
+    of each ring is dropped. Returns lon, lat and the new ring offsets.
+    """
+    starts = offsets[:-1]
+
+    # edges crossing the antimeridian take the short way around
+    dlon = np.diff(lon)
+    dlon = (dlon + 180.) % 360. - 180.
+    unwrapped = np.concatenate([[lon[0]], lon[0] + np.cumsum(dlon)])
+    lon = unwrapped - np.repeat(unwrapped[starts] - lon[starts], np.diff(offsets))
+    dlon, dlat = np.diff(lon), np.diff(lat)
+
+    # number of output vertices per edge, edges between rings emit nothing
+    n = np.maximum(np.ceil(np.maximum(np.abs(dlon), np.abs(dlat)) / step), 1).astype(int)
+    n[offsets[1:-1] - 1] = 0
+
+    seg = np.repeat(np.arange(len(n)), n)
+    frac = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / np.repeat(n, n).astype(float)
+
+    counts = np.add.reduceat(n, starts) if len(n) else np.zeros(len(starts), dtype=int)
+    new_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    return lon[seg] + dlon[seg] * frac, lat[seg] + dlat[seg] * frac, new_offsets
+
+
+def _geodesic_areas(shps):
+    """
+    Geodesic area of many shapely geometries in 4326, in m2
+    """
+    return _geodesic_ring_areas(*_flatten_rings(shps), n=len(shps))
+
+
+def _geodesic_ring_areas(lon, lat, offsets, geom_idx, holes, n):
+    """
+    Geodesic area in m2 of each of `n` geometries from flattened rings
+    """
+    if not len(geom_idx):
+        return np.zeros(n)
+    lon, lat, offsets = _densify_rings(lon, lat, offsets)
+
+    ring_areas = np.zeros(len(geom_idx))
+    for r in range(len(geom_idx)):
+        if offsets[r + 1] - offsets[r] >= 3:
+            area, _ = _GEOD.polygon_area_perimeter(lon[offsets[r]:offsets[r + 1]], lat[offsets[r]:offsets[r + 1]])
+            ring_areas[r] = abs(area)
+    ring_areas[holes] *= -1
+
+    return np.bincount(geom_idx, weights=ring_areas, minlength=n)
+
+
+@ingest_wkt
+def geodesicArea(aoi):
+    """
+    Get the area of a WKT in 4326 on the WGS84 ellipsoid, without reprojecting.
+    Accurate at any extent, including AOIs spanning many UTM zones or the antimeridian.
+    """
+    shp = shapely.wkt.loads(aoi)
+    # calculate geodesic area in km2
+    km2 = _geodesic_areas([shp])[0] / 1000000.
+
+    return km2
+
+
+def utmZones(latitude, longitude):
+    """
+    Determine the UTM zone numbers and hemispheres for arrays of lat/lon,
+    including the Norway and Svalbard zone exceptions
+
+    Returns
+    -------
+    zones, hemispheres
+        int array of zone numbers and array of 'north'/'south'
+    """
+    try:
+        lat = np.asarray(latitude, dtype=float)
+        lon = np.asarray(longitude, dtype=float)
+    except (TypeError, ValueError):
+        raise InputError('latitude and longitude must be numeric values')
+    if lat.shape != lon.shape:
+        raise InputError('latitude and longitude must have the same shape')
+    if np.isnan(lat).any() or np.isnan(lon).any():
+        raise InputError('latitude and longitude must be numeric values')
+    if ((lat < -90) | (lat > 90)).any():
+        raise InputError('latitude must be between -90 and 90')
+    if ((lon < -180) | (lon > 180)).any():
+        raise InputError('longitude must be between -180 and 180')
+
+    zones = (np.floor((lon + 180) / 6).astype(int) % 60) + 1
+
+    # southwest Norway
+    zones = np.where((lat >= 56) & (lat < 64) & (lon >= 3) & (lon < 12), 32, zones)
+
+    # Svalbard
+    svalbard = (lat >= 72) & (lat <= 84) & (lon >= 0) & (lon < 42)
+    zones = np.where(svalbard, np.array([31, 33, 35, 37])[np.searchsorted([9, 21, 33], lon, side='right')], zones)
+
+    hemispheres = np.where(lat < 0, 'south', 'north')
+
+    return zones, hemispheres
+
+
+def utmEPSG(latitude, longitude):
+    """
+    Determine the WGS84 UTM EPSG codes (326xx north, 327xx south) for arrays of lat/lon.
+    Useful as a single key for grouping geometries by projection.
+    """
+    zones, hemispheres = utmZones(latitude, longitude)
+    return np.where(hemispheres == 'south', 32700, 32600) + zones
+
+
+def _utm_proj(zone, hemisphere):
+    # convert UTM zone info to something pyproj can understand
+    return pyproj.Proj(proj='utm', zone=int(zone), ellps='WGS84', hemisphere=str(hemisphere))
+
+
 @ingest_wkt
 def getUTMProj(aoi):
     """
@@ -46,16 +474,9 @@ def getUTMProj(aoi):
     # get the centroid of the shape
     loc = convertAOItoLocation(aoi)
     # find the UTM info
-    utm_def = utm.from_latlon(loc[0], loc[1])
-    zone = utm_def[-2]
-    # convert UTM zone info to something pyproj can understand
-    if loc[0] < 0:
-        hem = 'south'
-    else:
-        hem = 'north'
-    to_p = pyproj.Proj(proj='utm', zone=zone, ellps='WGS84', hemisphere=hem)
+    zones, hemispheres = utmZones(loc[0], loc[1])
 
-    return to_p
+    return _utm_proj(zones, hemispheres)
 
 
 @ingest_latlon
@@ -64,26 +485,85 @@ def getLLUTMProj(latitude, longitude):
     Determine the UTM Projection for a LatLong
     """
     # find the UTM info
-    utm_def = utm.from_latlon(latitude, longitude)
-    zone = utm_def[-2]
-    # convert UTM zone info to something pyproj can understand
-    if latitude < 0:
-        hem = 'south'
-    else:
-        hem = 'north'
-    to_p = pyproj.Proj(proj='utm', zone=zone, ellps='WGS84', hemisphere=hem)
+    zones, hemispheres = utmZones(latitude, longitude)
 
-    return to_p
+    return _utm_proj(zones, hemispheres)
 
 
 @ingest_wkt
-def utm_reproject_vector(polygon_wkt):
-    # load in the polygon
-    poly_shp = shapely.wkt.loads(polygon_wkt)
+def utm_reproject_vector(polygon_wkt, tolerance=None, return_error=False):
+    # load in the polygon, simplified to `tolerance` meters if given;
+    # `return_error` also returns the bound on the area error in km2
+    poly_shp, error_km2 = simplifyGeometry(shapely.wkt.loads(polygon_wkt), tolerance)
 
     # create projection function
     to_p = getUTMProj(polygon_wkt)
     from_p = pyproj.Proj(init='epsg:4326')
     project = partial(pyproj.transform, from_p, to_p)
     utm_polygon = transform(project, poly_shp)
-    return utm_polygon
+    return (utm_polygon, error_km2) if return_error else utm_polygon
+
+
+class AOI(object):
+    """
+    Precomputed AOI context, built once from a WKT string or shapely geometry
+    in 4326 and accepted in place of the AOI WKT by the gbdxaoi functions.
+
+    Holds the parsed geometry, its UTM projection and transformers, the
+    projected geometry, a prepared geometry for fast predicates, the UTM
+    area in km2 and the bounds.
+
+    Example
+    -------
+    from sensortools.tools.spatial import AOI
+    aoi = AOI('POLYGON ((-157.9 21.3, -157.8 21.3, -157.8 21.4, -157.9 21.4, -157.9 21.3))')
+    df = gbdxaoi.formatSearchResults(results, aoi)
+    """
+
+    def __init__(self, aoi):
+        if isinstance(aoi, str):
+            self.wkt = aoi
+            self.geometry = shapely.wkt.loads(aoi)
+        elif hasattr(aoi, 'geom_type'):
+            self.geometry = aoi
+            self.wkt = aoi.wkt
+        else:
+            raise InputError('AOI must be a WKT string or a shapely geometry')
+
+        self.to_p = getUTMProj(self.wkt)
+        self.from_p = pyproj.Proj(init='epsg:4326')
+        self._to_utm = pyproj.Transformer.from_proj(self.from_p, self.to_p, always_xy=True)
+        self._from_utm = pyproj.Transformer.from_proj(self.to_p, self.from_p, always_xy=True)
+
+        self.projected = self.project(self.geometry)
+        self.prepared = prep(self.geometry)
+        # area of projected units in km2
+        self.area = self.projected.area / 1000000.
+        self.bounds = self.geometry.bounds
+
+    @property
+    def to_utm(self):
+        """
+        pyproj Transformer from 4326 into the AOI's UTM zone
+        """
+        return self._to_utm
+
+    def project(self, shp, tolerance=None):
+        """
+        Project a shapely geometry in 4326 into the AOI's UTM zone, simplified
+        to `tolerance` meters first if given
+        """
+        return transform(self._to_utm.transform, simplifyGeometry(shp, tolerance)[0])
+
+    def unproject(self, shp):
+        """
+        Project a shapely geometry in the AOI's UTM zone back to 4326
+        """
+        return transform(self._from_utm.transform, shp)
+
+
+def asAOI(aoi):
+    """
+    Return `aoi` as an AOI context, building one from a WKT or geometry if needed
+    """
+    return aoi if isinstance(aoi, AOI) else AOI(aoi)
@@ -35,6 +35,11 @@ setup(
 
     packages=find_packages(exclude=['tests', 'docs', 'examples']),
     install_requires=requirements,
+    entry_points={
+        'console_scripts': [
+            'sensortools-aoi=sensortools.cli:main',
+        ],
+    },
     package_data={
         'sensortools': [
             'data/japan_urban.dbf',
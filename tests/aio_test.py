@@ -0,0 +1,51 @@
+from sensortools.duc import DUCClient
+import sensortools.aio
+from shapely.geometry import box
+import shapely.wkt
+from math import isclose
+import numpy as np
+import asyncio
+
+
+def test_aoicloudcover_async(gbdxsearch_resultsdf, fake_duc):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.iloc[:60].copy()
+    fake_duc.default_cloud = box(-159, 21, -157, 22)
+
+    df = asyncio.run(sensortools.aio.aoiCloudCover(df, aoi, client=DUCClient(api_key='test-key', url=fake_duc.url),
+                                                    concurrency=2, batch_size=20))
+
+    cloudy = df['catalog_id'].isin(df.loc[df['Cloud Cover'] > 0, 'catalog_id'])
+    assert len(fake_duc.requests) == np.ceil((df['Cloud Cover'] > 0).sum() / 20.)
+    assert all(r['x-api-key'] == 'test-key' for r in fake_duc.requests)
+    assert all(isclose(pct, 100.) for pct in df.loc[cloudy, 'AOI Cloud Cover'])
+    assert (df.loc[~cloudy, 'AOI Cloud Cover'] == 0).all()
+
+
+def test_aoicloudcover_async_partial(gbdxsearch_resultsdf, fake_duc):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.copy()
+    catid = df.loc[df['Cloud Cover'] > 0, 'catalog_id'].iloc[0]
+    minx, miny, maxx, maxy = shapely.wkt.loads(df.loc[df['catalog_id'] == catid, 'Footprint WKT'].iloc[0]).bounds
+    fake_duc.clouds[catid] = box(minx - 1, miny - 1, (minx + maxx) / 2., maxy + 1)
+
+    df = asyncio.run(sensortools.aio.aoiCloudCover(df, aoi, client=DUCClient(api_key='test-key', url=fake_duc.url)))
+
+    assert 0 < df.loc[df['catalog_id'] == catid, 'AOI Cloud Cover'].iloc[0] < 100
+    assert (df.loc[df['catalog_id'] != catid, 'AOI Cloud Cover'] == 0).all()
+
+
+def test_aoicloudcover_async_stub_client(gbdxsearch_resultsdf):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.iloc[:60].copy()
+    cloud = box(-159, 21, -157, 22).__geo_interface__
+
+    class StubClient(object):
+        async def aquery(self, cats, envelope=None):
+            await asyncio.sleep(0)
+            return {'features': [{'properties': {'image_identifier': c}, 'geometry': cloud} for c in cats]}
+
+    df = asyncio.run(sensortools.aio.aoiCloudCover(df, aoi, client=StubClient(), batch_size=20))
+
+    cloudy = df['catalog_id'].isin(df.loc[df['Cloud Cover'] > 0, 'catalog_id'])
+    assert all(isclose(pct, 100.) for pct in df.loc[cloudy, 'AOI Cloud Cover'])
@@ -0,0 +1,90 @@
+import sensortools.gbdxaoi
+import sensortools.cache
+from shapely.geometry import box
+import pytest
+import copy
+import os
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    cache = sensortools.cache.enableCache(maxsize=4, cache_dir=str(tmp_path / 'cache'))
+    yield cache
+    sensortools.cache.disableCache()
+
+
+def test_cache_formatsearchresults(gbdxsearch_results, result_cache):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    first = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    first['Cloud Cover'] = -1
+    second = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    assert second['Cloud Cover'].iloc[0] == 23
+    assert sensortools.cache.cacheStats()['hits'] == 1
+    assert sensortools.cache.cacheStats()['misses'] == 1
+
+
+def test_cache_invalidates_on_input_change(gbdxsearch_results, result_cache):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, box(-157.9, 21.3, -157.85, 21.4).wkt)
+    changed = copy.deepcopy(gbdxsearch_results)
+    changed[0]['properties']['cloudCover'] = 50
+    assert sensortools.gbdxaoi.formatSearchResults(changed, aoi)['Cloud Cover'].iloc[0] == 50
+    assert sensortools.cache.cacheStats()['hits'] == 0
+
+
+def test_cache_coverage_and_disk(gbdxsearch_resultsdf, result_cache, tmp_path):
+    aoi = box(-158.360, 21.15, -157.800, 22.000).wkt
+    pct = sensortools.gbdxaoi.aoiFootprintPctCoverage(gbdxsearch_resultsdf, aoi)
+    sensortools.gbdxaoi.aoiFootprintIntersection(gbdxsearch_resultsdf, aoi)
+
+    # a new session with the same cache directory reads results from disk
+    sensortools.cache.enableCache(cache_dir=str(tmp_path / 'cache'))
+    assert sensortools.gbdxaoi.aoiFootprintPctCoverage(gbdxsearch_resultsdf, aoi) == pct
+    stats = sensortools.cache.cacheStats()
+    assert stats['disk_hits'] == 1
+    assert stats['hit_rate'] == 1.
+
+
+def test_cache_lru():
+    cache = sensortools.cache.ResultCache(maxsize=2)
+    for key in 'abc':
+        cache.set(key, key)
+    assert cache.get('a') == (False, None)
+    assert cache.get('c') == (True, 'c')
+
+
+def test_cache_disabled(gbdxsearch_results):
+    assert sensortools.cache.cacheStats() is None
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    assert sensortools.cache.cacheStats() is None
+
+
+def test_cache_corrupt_pickle(tmp_path):
+    cache = sensortools.cache.ResultCache(cache_dir=str(tmp_path))
+    cache.set('a', 1)
+    assert os.listdir(str(tmp_path)) == ['a.pkl']
+    with open(os.path.join(str(tmp_path), 'a.pkl'), 'wb') as f:
+        f.write(b'not a pickle')
+    cache = sensortools.cache.ResultCache(cache_dir=str(tmp_path))
+    assert cache.get('a') == (False, None)
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_version_key(gbdxsearch_results, result_cache, monkeypatch):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    monkeypatch.setattr(sensortools.cache, '__version__', '0.0.0')
+    sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    assert sensortools.cache.cacheStats()['misses'] == 2
+
+
+def test_cache_formatsearchresults_compact_verbose(gbdxsearch_results, result_cache, capsys):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    compact = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi, compact=True, verbose=True)
+    # the compact, verbose call reuses the cached formatting and still reports
+    assert sensortools.cache.cacheStats()['hits'] == 1
+    assert 'Search results memory' in capsys.readouterr().out
+    assert compact['Sensor'].dtype == 'category'
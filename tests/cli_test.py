@@ -0,0 +1,82 @@
+import sensortools.cli
+import sensortools.gbdxaoi
+from shapely.geometry import box, mapping
+import pandas as pd
+import pytest
+import json
+import os
+
+
+@pytest.fixture
+def catalog_path(gbdxsearch_resultsdf, tmp_path):
+    records = []
+    for i, row in gbdxsearch_resultsdf.iloc[:40].iterrows():
+        records.append({'identifier': row['image_identifier'],
+                        'properties': {'catalogID': row['catalog_id'],
+                                       'sensorPlatformName': row['Sensor'],
+                                       'timestamp': row['Date'],
+                                       'cloudCover': row['Cloud Cover'],
+                                       'footprintWkt': row['Footprint WKT']}})
+    path = str(tmp_path / 'catalog.json')
+    with open(path, 'w') as f:
+        json.dump(records, f)
+    return path
+
+
+@pytest.fixture
+def aoi_path(tmp_path):
+    features = [{'type': 'Feature', 'properties': {'name': name}, 'geometry': mapping(geom)}
+                for name, geom in [('honolulu', box(-157.9, 21.3, -157.8, 21.4)),
+                                   ('ocean', box(-150, 10, -149.9, 10.1))]]
+    path = str(tmp_path / 'aois.geojson')
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    return path
+
+
+def test_cli_run(catalog_path, aoi_path, tmp_path):
+    out = str(tmp_path / 'out')
+    sensortools.cli.main([catalog_path, aoi_path, out, '--id-field', 'name', '--chunk-size', '1'])
+
+    summary = pd.read_parquet(os.path.join(out, 'summary.parquet')).set_index('aoi_id')
+    assert summary.loc['honolulu', 'results'] > 0
+    assert summary.loc['ocean', 'results'] == 0
+    assert summary.loc['ocean', 'coverage_pct'] == 0
+    results = pd.read_parquet(os.path.join(out, 'aoi_honolulu.parquet'))
+    assert len(results) == summary.loc['honolulu', 'results']
+
+
+def test_cli_resume(catalog_path, aoi_path, tmp_path):
+    out = str(tmp_path / 'out')
+    first = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name', fmt='csv')
+    mtime = os.path.getmtime(os.path.join(out, 'aoi_honolulu.csv'))
+    second = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name', fmt='csv')
+    assert os.path.getmtime(os.path.join(out, 'aoi_honolulu.csv')) == mtime
+    assert sorted(second['aoi_id']) == sorted(first['aoi_id'])
+
+
+def test_cli_workers(catalog_path, aoi_path, tmp_path):
+    out = str(tmp_path / 'out')
+    summary = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name', workers=2)
+    assert sorted(summary['aoi_id']) == ['honolulu', 'ocean']
+
+
+def test_cli_resume_interrupted(catalog_path, aoi_path, tmp_path):
+    out = str(tmp_path / 'out')
+    first = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name', chunk_size=1)
+    # interrupted after writing ocean's results but before its summary row
+    os.remove(os.path.join(out, 'aoi_ocean.summary.json'))
+    second = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name', chunk_size=1)
+    assert list(second['aoi_id']) == ['honolulu', 'ocean']
+    third = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name')
+    assert list(third['aoi_id']) == list(first['aoi_id'])
+    summary = pd.read_parquet(os.path.join(out, 'summary.parquet'))
+    assert list(summary['aoi_id']) == ['honolulu', 'ocean']
+
+
+def test_cli_prefilter_keeps_intersecting_records(catalog_path, aoi_path, tmp_path):
+    out = str(tmp_path / 'out')
+    summary = sensortools.cli.run(catalog_path, aoi_path, out, id_field='name').set_index('aoi_id')
+    records = sensortools.cli.loadCatalog(catalog_path)
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    assert summary.loc['honolulu', 'results'] == len(sensortools.gbdxaoi.formatSearchResults(records, aoi))
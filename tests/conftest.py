@@ -1,8 +1,12 @@
-from shapely.geometry import shape
+from shapely.geometry import shape, mapping, box
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
 import pandas as pd
+import threading
 import pytest
 import json
 import os
+import re
 
 
 @pytest.fixture(scope='session')
@@ -40,3 +44,62 @@ def search_intersection_geom(data_dir):
     with open(path, 'r') as f:
         geojson = json.load(f)
     return shape(geojson['geometry'])
+
+
+@pytest.fixture(scope='session')
+def catalog_record():
+    """Factory of catalog search records with the given properties."""
+    def record(identifier, catid, sensor, **props):
+        props.update({'catalogID': catid, 'sensorPlatformName': sensor})
+        return {'identifier': identifier, 'properties': props}
+    return record
+
+
+class FakeDUC(object):
+    """Local stand-in for the DUC cloud cover MapServer query endpoint"""
+    def __init__(self):
+        self.clouds = {}
+        self.default_cloud = None
+        self.requests = []
+
+    def features(self, catids, envelope=None):
+        features = []
+        for catid in catids:
+            cloud = self.clouds.get(catid, self.default_cloud)
+            if cloud is not None and (envelope is None or cloud.intersects(envelope)):
+                features.append({'type': 'Feature',
+                                 'properties': {'image_identifier': catid},
+                                 'geometry': mapping(cloud)})
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+@pytest.fixture
+def fake_duc():
+    duc = FakeDUC()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('content-length', 0))
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+            form['x-api-key'] = self.headers.get('x-api-key')
+            duc.requests.append(form)
+            catids = re.findall(r"'([^']+)'", form.get('where', ''))
+            envelope = box(*map(float, form['geometry'].split(','))) if 'geometry' in form else None
+            body = json.dumps(duc.features(catids, envelope)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('content-type', 'application/json')
+            self.send_header('content-length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    duc.url = 'http://127.0.0.1:{}/query'.format(server.server_address[1])
+    yield duc
+    server.shutdown()
+    server.server_close()
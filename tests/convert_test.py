@@ -23,3 +23,26 @@ def test_gb_to_km2(gb100_to_km2_truth):
 def test_km2_to_gb(km100_to_gb_truth):
     test_df_output = sensortools.convert.km2_to_gb(100).sort_values(by=['Sensor']).reset_index(drop=True)
     assert_frame_equal(km100_to_gb_truth, test_df_output, check_dtype=False)
+
+
+def test_catalog_to_gb(gbdxsearch_results):
+    df = sensortools.convert.catalog_to_gb(gbdxsearch_results, aggregate=False)
+    assert df['Raw Size (GB)'].iloc[0] == pytest.approx(42500 * 38420 * 2 / 1e+9)
+    # tile size derived from the image size, as the catalog reports 0
+    assert df['Tiled Size (GB)'].iloc[0] == pytest.approx(42 * 1012 * 38 * 1012 * 2 / 1e+9)
+
+
+def test_catalog_to_gb_aggregate(catalog_record):
+    record = catalog_record
+    records = [
+        record('pan', 'A', 'WORLDVIEW02', imageWidth=100, imageHeight=200, numBands=1, dataType='UNSIGNED_SHORT',
+               numXTiles=2, numYTiles=2, tileXSize=64, tileYSize=128),
+        record('ms', 'A', 'WORLDVIEW02', imageWidth=25, imageHeight=50, numBands=8, dataType='UNSIGNED_SHORT',
+               numXTiles=1, numYTiles=1, tileXSize=0, tileYSize=0),
+        record('landsat', 'LC8', 'LANDSAT08'),
+    ]
+    df = sensortools.convert.catalog_to_gb(records).set_index('catalog_id')
+    assert df.loc['A', 'Image Count'] == 2
+    assert df.loc['A', 'Raw Size (GB)'] == pytest.approx((100 * 200 * 2 + 25 * 50 * 16) / 1e+9)
+    assert df.loc['A', 'Tiled Size (GB)'] == pytest.approx((4 * 64 * 128 * 2 + 25 * 50 * 16) / 1e+9)
+    assert pd.isnull(df.loc['LC8', 'Raw Size (GB)'])
@@ -0,0 +1,60 @@
+from sensortools.duc import DUCClient
+from sensortools.exceptions import MissingDUCAPIkeyError, DUCAPIkeyFormattingError
+from shapely.geometry import box
+import pytest
+
+
+def test_ducclient_argument(monkeypatch):
+    monkeypatch.setenv('DUC_API_KEY', 'env-key')
+    assert DUCClient(api_key='arg-key').api_key == 'arg-key'
+
+
+def test_ducclient_env(monkeypatch):
+    monkeypatch.setenv('DUC_API_KEY', 'env-key')
+    monkeypatch.setenv('DUC_URL', 'http://localhost/query')
+    client = DUCClient()
+    assert client.api_key == 'env-key'
+    assert client.url == 'http://localhost/query'
+
+
+def test_ducclient_key_file(monkeypatch, tmp_path):
+    monkeypatch.delenv('DUC_API_KEY', raising=False)
+    key_file = tmp_path / 'key.txt'
+    key_file.write_text(u'file-key\n')
+    assert DUCClient(key_file=str(key_file)).api_key == 'file-key'
+
+
+def test_ducclient_missing_key(monkeypatch, tmp_path):
+    monkeypatch.delenv('DUC_API_KEY', raising=False)
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(MissingDUCAPIkeyError):
+        DUCClient()
+
+
+def test_ducclient_empty_key_file(monkeypatch, tmp_path):
+    monkeypatch.delenv('DUC_API_KEY', raising=False)
+    key_file = tmp_path / 'key.txt'
+    key_file.write_text(u'')
+    with pytest.raises(DUCAPIkeyFormattingError):
+        DUCClient(key_file=str(key_file))
+
+
+def test_ducclient_query(fake_duc):
+    fake_duc.clouds['A'] = box(0, 0, 1, 1)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+    clouds = client.query(['A', 'B'])
+    assert [f['properties']['image_identifier'] for f in clouds['features']] == ['A']
+    assert fake_duc.requests[0]['x-api-key'] == 'test-key'
+    assert fake_duc.requests[0]['where'] == "image_identifier IN ('A','B')"
+
+
+def test_ducclient_envelope_request():
+    client = DUCClient(api_key='test-key', max_allowable_offset=0.0001)
+    headers, data = client.request(['A'], envelope=(-158.2, 21.27, -157.8, 21.73))
+    assert data['geometry'] == '-158.2,21.27,-157.8,21.73'
+    assert data['geometryType'] == 'esriGeometryEnvelope'
+    assert data['spatialRel'] == 'esriSpatialRelIntersects'
+    assert data['outFields'] == 'image_identifier'
+    assert data['geometryPrecision'] == '6'
+    assert data['maxAllowableOffset'] == '0.0001'
+    assert 'geometry' not in client.request(['A'])[1]
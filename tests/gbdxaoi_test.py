@@ -1,19 +1,33 @@
 import sensortools.tools.spatial as spatial_tools
 import sensortools.gbdxaoi
+import sensortools.convert
+from sensortools.duc import DUCClient
 # from pandas.util.testing import assert_frame_equal
-from shapely.geometry import box
+from shapely.geometry import Point, box
 from math import isclose
 import pandas as pd
 import numpy as np
+import threading
+import pytest
+import os
+import re
 
 
 def test_fpaoiintersect():
     aoi = box(-5, -8, 5, 8)
     fprint = box(-5, -8, 0, 0)
-    truth_pct = 19.915495233
+    truth_pct = 24.991945836
     assert isclose(sensortools.gbdxaoi._fpaoiintersect(fprint.wkt, aoi.wkt), truth_pct)
 
 
+def test_fpaoiintersect_footprint_other_zone():
+    # the AOI is in UTM zone 31, the footprint's own centroid in zone 30
+    aoi = box(-5, -8, 5, 8)
+    fprint = box(-5, -8, 0, 8)
+    geodesic_pct = spatial_tools.geodesicArea(fprint.wkt) / spatial_tools.geodesicArea(aoi.wkt) * 100.
+    assert isclose(sensortools.gbdxaoi._fpaoiintersect(fprint.wkt, aoi.wkt), geodesic_pct, rel_tol=0.03)
+
+
 def test_formatSearchResults_image_identifier(gbdxsearch_results):
     aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
     df_results = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
@@ -124,4 +138,362 @@ def test_aoifootprintpctcoverage_partialcoverage(gbdxsearch_resultsdf):
     aoi = box(-158.360, 21.15, -157.800, 22.000)
     assert isclose(sensortools.gbdxaoi.aoiFootprintPctCoverage(gbdxsearch_resultsdf, aoi.wkt), 72.33696128)
 
-# How to test aoicloudcover?
+
+@pytest.fixture
+def idaho_records(catalog_record):
+    def record(identifier, catid, fp, **props):
+        return catalog_record(identifier, catid, 'WORLDVIEW03_VNIR', timestamp='2018-01-15T21:24:49.255Z',
+                              footprintWkt=fp, **props)
+    return [
+        record('1040010037000000', '1040010037000000', box(-158, 21.2, -157.7, 21.5).wkt, cloudCover=10),
+        record('pan-part', '1040010037000000', box(-158, 21.2, -157.7, 21.45).wkt, numBands=1),
+        record('ms-part', '1040010037000000', box(-158, 21.2, -157.7, 21.45).wkt, numBands=8),
+        record('pan-only', '1040010038000000', box(-157.95, 21.3, -157.85, 21.4).wkt),
+        record('ms-only', '1040010038000000', box(-157.9, 21.3, -157.8, 21.4).wkt),
+    ]
+
+
+def test_formatSearchResults_collapse(idaho_records):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    df_results = sensortools.gbdxaoi.formatSearchResults(idaho_records, aoi, collapse=True)
+    assert len(df_results) == 2
+    acq = df_results[df_results['catalog_id'] == '1040010037000000'].iloc[0]
+    assert acq['image_identifier'] == '1040010037000000'
+    assert acq['Image Count'] == 3
+    assert acq['Image Identifiers'] == '1040010037000000,pan-part,ms-part'
+    assert acq['Footprint WKT'] == box(-158, 21.2, -157.7, 21.5).wkt
+    assert acq['Cloud Cover'] == 10
+
+
+def test_formatSearchResults_collapse_parts_only(idaho_records):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    df_results = sensortools.gbdxaoi.formatSearchResults(idaho_records, aoi, collapse=True)
+    parts = df_results[df_results['catalog_id'] == '1040010038000000'].iloc[0]
+    assert parts['Image Count'] == 2
+    assert isclose(parts['Footprint AOI Inter Percent'], 100., rel_tol=1e-3)
+
+
+def test_aoicloudcover_pipeline(gbdxsearch_resultsdf, fake_duc):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.iloc[:120].copy()
+    fake_duc.default_cloud = box(-159, 21, -157, 22)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+
+    df = sensortools.gbdxaoi.aoiCloudCover(df, aoi, client=client, queue_depth=1)
+
+    stats = df.attrs['cloud_pipeline_stats']
+    assert stats['fetch']['batches'] == stats['compute']['batches'] == len(fake_duc.requests)
+    assert stats['fetch']['features'] == stats['compute']['features']
+    cloudy = df['catalog_id'].isin(df.loc[df['Cloud Cover'] > 0, 'catalog_id'])
+    assert all(isclose(pct, 100.) for pct in df.loc[cloudy, 'AOI Cloud Cover'])
+    assert (df.loc[~cloudy, 'AOI Cloud Cover'] == 0).all()
+
+
+def test_aoicloudcover_tolerance(gbdxsearch_resultsdf, fake_duc):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.iloc[:40].copy()
+    fake_duc.default_cloud = Point(-158.0, 21.5).buffer(0.1, resolution=512)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+
+    exact = sensortools.gbdxaoi.aoiCloudCover(df.copy(), aoi, client=client)
+    fast = sensortools.gbdxaoi.aoiCloudCover(df.copy(), aoi, client=client, tolerance=20.)
+    assert 'AOI Cloud Cover Error' not in exact.columns
+    error = (fast['AOI Cloud Cover'] - exact['AOI Cloud Cover']).abs()
+    assert (error <= fast['AOI Cloud Cover Error'] + 1e-9).all()
+    assert fast['AOI Cloud Cover Error'].max() > 0
+
+
+def test_footprint_coverage_tolerance(catalog_record):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    footprint = Point(-158.0, 21.5).buffer(0.1, resolution=512)
+    df = pd.DataFrame({'Footprint WKT': [footprint.wkt]})
+    exact = sensortools.gbdxaoi.aoiFootprintPctCoverage(df, aoi)
+    fast, bound = sensortools.gbdxaoi.aoiFootprintPctCoverage(df, aoi, tolerance=20., return_error=True)
+    assert fast != exact
+    assert 0 < abs(fast - exact) <= bound
+    inter, error_km2 = sensortools.gbdxaoi.aoiFootprintIntersection(df, aoi, tolerance=20., return_error=True)
+    exact_km2 = spatial_tools.aoiArea(sensortools.gbdxaoi.aoiFootprintIntersection(df, aoi).wkt)
+    assert 0 < exact_km2 - spatial_tools.aoiArea(inter.wkt) <= error_km2
+
+    records = [catalog_record('a', 'a', 'WORLDVIEW03_VNIR', timestamp='2018-01-15T21:24:49.255Z',
+                              footprintWkt=footprint.wkt)]
+    fast = sensortools.gbdxaoi.formatSearchResults(records, aoi, tolerance=20.)
+    assert abs(fast['Footprint AOI Inter Percent'].iloc[0] - exact) <= \
+        fast['Footprint AOI Inter Percent Error'].iloc[0]
+    assert 'Footprint AOI Inter Percent Error' not in sensortools.gbdxaoi.formatSearchResults(records, aoi).columns
+
+
+def test_aoicloudcover_compute_error_stops_fetcher(gbdxsearch_resultsdf, fake_duc, monkeypatch):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.iloc[:200].copy()
+    fake_duc.default_cloud = box(-159, 21, -157, 22)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+
+    def fail(*args, **kwargs):
+        raise ValueError('compute failed')
+    monkeypatch.setattr(sensortools.gbdxaoi, '_cloudFeaturePcts', fail)
+
+    with pytest.raises(ValueError):
+        sensortools.gbdxaoi.aoiCloudCover(df, aoi, client=client, queue_depth=1)
+    for thread in threading.enumerate():
+        if thread.name == 'sensortools-cloud-fetch':
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+    # the fetcher stopped instead of requesting every batch
+    assert len(fake_duc.requests) < len(sensortools.gbdxaoi._cloudCatalogBatches(df))
+
+
+def test_aoiscloudcover(gbdxsearch_resultsdf, fake_duc):
+    aois = [box(-158.220, 21.27, -157.900, 21.73).wkt, box(-158.0, 21.27, -157.800, 21.73).wkt]
+    dfs = [gbdxsearch_resultsdf.iloc[:60].copy(), gbdxsearch_resultsdf.iloc[30:90].copy()]
+    fake_duc.default_cloud = box(-158.1, 21.3, -157.95, 21.6)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+
+    single = [sensortools.gbdxaoi.aoiCloudCover(df.copy(), aoi, client=client) for df, aoi in zip(dfs, aois)]
+    fake_duc.requests = []
+    shared = sensortools.gbdxaoi.aoisCloudCover([df.copy() for df in dfs], aois, client=client)
+
+    # each catalog id with cloud cover is requested once
+    requested = [c for form in fake_duc.requests for c in re.findall(r"'([^']+)'", form['where'])]
+    cloudy = pd.concat(dfs).query('`Cloud Cover` > 0')['catalog_id']
+    assert sorted(requested) == sorted(cloudy.unique())
+    for one, many in zip(single, shared):
+        assert np.allclose(one['AOI Cloud Cover'].values, many['AOI Cloud Cover'].values)
+        assert (one['Cloud WKT'] == many['Cloud WKT']).all()
+    assert shared[0]['AOI Cloud Cover'].max() > 0
+    # the cloud misses the second AOI but its WKT is still stored, as in aoiCloudCover
+    assert (shared[1]['Cloud WKT'] != '').any()
+
+
+def test_aoiscloudcover_server_filter_clusters(gbdxsearch_resultsdf, fake_duc):
+    aois = [box(-158.220, 21.27, -157.900, 21.73).wkt, box(-158.0, 21.27, -157.800, 21.73).wkt,
+            box(-150, 10, -149.9, 10.1).wkt]
+    dfs = [gbdxsearch_resultsdf.iloc[:60].copy(), gbdxsearch_resultsdf.iloc[30:90].copy(),
+           gbdxsearch_resultsdf.iloc[:20].copy()]
+    fake_duc.default_cloud = box(-158.1, 21.3, -157.95, 21.6)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+
+    single = [sensortools.gbdxaoi.aoiCloudCover(df.copy(), aoi, client=client, server_filter=True)
+              for df, aoi in zip(dfs, aois)]
+    fake_duc.requests = []
+    shared = sensortools.gbdxaoi.aoisCloudCover([df.copy() for df in dfs], aois, client=client, server_filter=True)
+
+    # each catalog id is requested once: those of the Oahu AOIs with their
+    # shared envelope, those shared with the far away AOI with the envelope
+    # around every AOI
+    requested = [c for form in fake_duc.requests for c in re.findall(r"'([^']+)'", form['where'])]
+    cloudy = pd.concat(dfs).query('`Cloud Cover` > 0')['catalog_id']
+    assert sorted(requested) == sorted(cloudy.unique())
+    assert len(set(form['geometry'] for form in fake_duc.requests)) == 2
+    for one, many in zip(single, shared):
+        assert np.allclose(one['AOI Cloud Cover'].values, many['AOI Cloud Cover'].values)
+        assert (one['Cloud WKT'] == many['Cloud WKT']).all()
+        assert 'cloud_pipeline_stats' in many.attrs
+
+
+def test_aoiscloudcover_empty(fake_duc):
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+    assert sensortools.gbdxaoi.aoisCloudCover([], [], client=client, server_filter=True) == []
+    assert fake_duc.requests == []
+
+
+def test_aoiscloudcover_no_clouds(gbdxsearch_resultsdf, fake_duc):
+    aois = [box(-158.220, 21.27, -157.900, 21.73).wkt]
+    dfs = [gbdxsearch_resultsdf.iloc[:20].copy()]
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+    dfs = sensortools.gbdxaoi.aoisCloudCover(dfs, aois, client=client)
+    assert (dfs[0]['AOI Cloud Cover'] == 0).all()
+    assert dfs[0].attrs['cloud_pipeline_stats']['fetch']['features'] == 0
+
+
+def test_cloudfeaturepcts_repairs_invalid_clouds():
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    df = pd.DataFrame({'catalog_id': ['A', 'A'],
+                       'Footprint WKT': [box(-157.9, 21.3, -157.85, 21.4).wkt, box(-157.9, 21.3, -157.8, 21.4).wkt]})
+    aoi_footprints = sensortools.gbdxaoi._AOIFootprintCache(df, spatial_tools.AOI(aoi))
+    # self-intersecting bowtie cloud
+    bowtie = {'type': 'Polygon', 'coordinates': [[[-157.9, 21.3], [-157.85, 21.4], [-157.85, 21.3],
+                                                  [-157.9, 21.4], [-157.9, 21.3]]]}
+    clouds = {'features': [{'properties': {'image_identifier': 'A'}, 'geometry': bowtie}]}
+    pcts = sensortools.gbdxaoi._cloudFeaturePcts(clouds, aoi_footprints)
+    assert len(pcts) == 1
+    # footprint is the first record of the catalog id, the unrepaired bowtie covers half of it
+    assert 0 < pcts[0][1] <= 50.
+    assert len(aoi_footprints._intersections) == 1
+
+
+def test_aoicloudcover_server_filter(gbdxsearch_resultsdf, fake_duc):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = gbdxsearch_resultsdf.iloc[:60].copy()
+    cats = df.loc[df['Cloud Cover'] > 0, 'catalog_id'].unique()
+    fake_duc.default_cloud = box(-159, 21, -157, 22)
+    # a cloud away from the AOI is dropped by the server
+    fake_duc.clouds[cats[0]] = box(-150, 10, -149, 11)
+    client = DUCClient(api_key='test-key', url=fake_duc.url)
+
+    filtered = sensortools.gbdxaoi.aoiCloudCover(df.copy(), aoi, client=client, server_filter=True)
+    unfiltered = sensortools.gbdxaoi.aoiCloudCover(df.copy(), aoi, client=client)
+
+    assert all('geometry' in r for r in fake_duc.requests[:len(fake_duc.requests) // 2])
+    assert (filtered['AOI Cloud Cover'] == unfiltered['AOI Cloud Cover']).all()
+    assert (filtered.loc[filtered['catalog_id'] == cats[0], 'Cloud WKT'] == '').all()
+    assert (unfiltered.loc[unfiltered['catalog_id'] == cats[0], 'Cloud WKT'] != '').all()
+
+
+def test_compactsearchresults(gbdxsearch_resultsdf):
+    df = gbdxsearch_resultsdf.copy()
+    df['Date'] = pd.to_datetime(df['Date'])
+    df.index = df['Date']
+    compact = sensortools.gbdxaoi.compactSearchResults(df, verbose=False)
+    assert compact.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+    assert str(compact['Sensor'].dtype) == 'category'
+    assert str(compact['catalog_id'].dtype) == 'category'
+    assert str(compact['Cloud Cover'].dtype) == 'UInt8'
+    assert compact['Off Nadir Angle'].dtype == np.float32
+    assert 'x' not in compact.columns
+    assert isinstance(compact.index, pd.RangeIndex)
+    assert np.allclose(compact['Footprint AOI Inter Percent'], df['Footprint AOI Inter Percent'], rtol=1e-6)
+
+
+def test_compactsearchresults_drop_wkt(gbdxsearch_resultsdf):
+    compact = sensortools.gbdxaoi.compactSearchResults(gbdxsearch_resultsdf, drop_wkt=True, verbose=False)
+    assert 'Footprint WKT' not in compact.columns
+
+
+def test_formatSearchResults_compact(gbdxsearch_results):
+    aoi = box(-157.9, 21.3, -157.8, 21.4).wkt
+    df_results = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi, compact=True)
+    assert df_results['Sensor'].iloc[0] == "WORLDVIEW03_VNIR"
+    assert df_results['Cloud Cover'].iloc[0] == 23
+    assert isclose(df_results['Sun Elevation'].iloc[0], 43.8, rel_tol=1e-6)
+
+
+def test_aoicloudcover_compact(gbdxsearch_resultsdf, fake_duc):
+    aoi = box(-158.220, 21.27, -157.800, 21.73).wkt
+    df = sensortools.gbdxaoi.compactSearchResults(gbdxsearch_resultsdf.iloc[:40], verbose=False)
+    fake_duc.default_cloud = box(-159, 21, -157, 22)
+    df = sensortools.gbdxaoi.aoiCloudCover(df, aoi, client=DUCClient(api_key='test-key', url=fake_duc.url))
+    assert isclose(df['AOI Cloud Cover'].max(), 100.)
+
+
+def test_aoi_context(gbdxsearch_results):
+    aoi_wkt = box(-157.9, 21.3, -157.8, 21.4).wkt
+    aoi = spatial_tools.AOI(aoi_wkt)
+    assert isclose(aoi.area, spatial_tools.aoiArea(aoi_wkt))
+    assert aoi.bounds == (-157.9, 21.3, -157.8, 21.4)
+    assert aoi.unproject(aoi.projected).equals_exact(aoi.geometry, 1e-9)
+    from_ctx = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi)
+    from_wkt = sensortools.gbdxaoi.formatSearchResults(gbdxsearch_results, aoi_wkt)
+    assert from_ctx['Footprint AOI Inter Percent'].iloc[0] == from_wkt['Footprint AOI Inter Percent'].iloc[0]
+
+
+def test_aoi_context_shape(gbdxsearch_resultsdf):
+    aoi = box(-158.360, 21.15, -157.800, 22.000)
+    assert isclose(sensortools.gbdxaoi.aoiFootprintPctCoverage(gbdxsearch_resultsdf, spatial_tools.AOI(aoi)),
+                   sensortools.gbdxaoi.aoiFootprintPctCoverage(gbdxsearch_resultsdf, aoi.wkt))
+
+
+def test_fpaoiintersect_branches():
+    aoi = spatial_tools.AOI(box(-157.9, 21.3, -157.8, 21.4))
+    # disjoint, footprint covering the AOI, footprint inside the AOI, partial overlap
+    assert sensortools.gbdxaoi._fpaoiintersect(box(-150, 10, -149, 11).wkt, aoi) == 0.
+    assert sensortools.gbdxaoi._fpaoiintersect(box(-158, 21, -157, 22).wkt, aoi) == 100.
+    inside = box(-157.875, 21.325, -157.825, 21.375)
+    assert isclose(sensortools.gbdxaoi._fpaoiintersect(inside.wkt, aoi),
+                   aoi.project(inside).area / aoi.projected.area * 100.)
+    assert isclose(sensortools.gbdxaoi._fpaoiintersect(box(-157.85, 21.3, -157.7, 21.4).wkt, aoi), 50., rel_tol=1e-3)
+
+
+def test_aoicoveragegrid():
+    aoi = box(-157.9, 21.3, -157.8, 21.4)
+    df = pd.DataFrame({
+        'catalog_id': ['A', 'B', 'B', 'C'],
+        'Date': pd.to_datetime(['2017-01-01', '2018-01-01', '2018-01-01', '2019-01-01']),
+        'Sensor': ['WORLDVIEW03_VNIR'] * 4,
+        'Cloud Cover': [0, 10, 10, 90],
+        'Off Nadir Angle': [10, 10, 10, 10],
+        'Footprint WKT': [box(-158, 21.2, -157.7, 21.5).wkt, box(-158, 21.2, -157.85, 21.5).wkt,
+                          box(-158, 21.2, -157.85, 21.5).wkt, box(-158, 21.2, -157.7, 21.5).wkt],
+        'Cloud WKT': ['', box(-158, 21.35, -157.7, 21.5).wkt, '', ''],
+    })
+    grid = sensortools.gbdxaoi.aoiCoverageGrid(df, aoi.wkt, cell_size=250., max_cloud=50)
+    count, inside = grid['count'], grid['aoi_mask']
+    # A covers the whole AOI, B (counted once) its western half, C is filtered out
+    assert count[inside].min() == 1
+    assert count[inside].max() == 2
+    assert isclose((count[inside] == 2).mean(), 0.5, abs_tol=0.05)
+    assert (count[~inside] == 0).all()
+    # B's clouds cover its northern half
+    assert isclose((grid['cloud_free_count'][inside] == 2).mean(), 0.25, abs_tol=0.05)
+    assert grid['latest'][inside].max() == np.datetime64('2018-01-01')
+    assert grid['latest'][inside].min() == np.datetime64('2017-01-01')
+
+
+def test_aoicoveragegrid_missing_cloud_wkt():
+    aoi = box(-157.9, 21.3, -157.8, 21.4)
+    df = pd.DataFrame({
+        'catalog_id': ['A', 'B'],
+        'Date': pd.to_datetime(['2017-01-01', '2018-01-01']),
+        'Sensor': ['WORLDVIEW03_VNIR'] * 2,
+        'Cloud Cover': [0, 10],
+        'Off Nadir Angle': [10, 10],
+        'Footprint WKT': [box(-158, 21.2, -157.7, 21.5).wkt] * 2,
+        'Cloud WKT': [np.nan, None],
+    })
+    grid = sensortools.gbdxaoi.aoiCoverageGrid(df, aoi.wkt, cell_size=250.)
+    inside = grid['aoi_mask']
+    assert (grid['cloud_free_count'][inside] == 2).all()
+
+
+def test_aoicoveragegrid_null_catalog_ids():
+    aoi = box(-157.9, 21.3, -157.8, 21.4)
+    df = pd.DataFrame({
+        'catalog_id': [None, None, None],
+        'Date': pd.to_datetime(['2017-01-01', '2018-01-01', '2019-01-01']),
+        'Sensor': ['LANDSAT08'] * 3,
+        'Cloud Cover': [0, 0, 0],
+        'Off Nadir Angle': [0, 0, 0],
+        'Footprint WKT': [box(-158, 21.2, -157.7, 21.5).wkt] * 3,
+    })
+    grid = sensortools.gbdxaoi.aoiCoverageGrid(df, aoi.wkt, cell_size=250.)
+    inside = grid['aoi_mask']
+    assert (grid['count'][inside] == 3).all()
+    assert grid['latest'][inside].min() == np.datetime64('2019-01-01')
+
+
+def test_aoitilesizing_grid(gbdxsearch_resultsdf):
+    aoi = box(-158.360, 21.15, -157.800, 22.000).wkt
+    sizing = sensortools.gbdxaoi.aoiTileSizing(gbdxsearch_resultsdf, aoi, tile_size=5000.)
+    # the clipped tiles partition the AOI
+    assert isclose(sizing['Tile Area (km2)'].sum(), spatial_tools.aoiArea(aoi))
+    assert (sizing['Tile Area (km2)'] <= 25. + 1e-6).all()
+    covered = sizing['Covered Area (km2)'].sum() / sizing['Tile Area (km2)'].sum() * 100.
+    assert isclose(covered, sensortools.gbdxaoi.aoiFootprintPctCoverage(gbdxsearch_resultsdf, aoi), rel_tol=1e-3)
+    assert sizing['Coverage Percent'].between(0, 100 + 1e-6).all()
+    rates = sensortools.convert.km2_to_gb(1).set_index('Sensor')['GB']
+    assert np.allclose(sizing['WV03_Pan GB'], sizing['Covered Area (km2)'] * rates['WV03_Pan'])
+
+
+def test_aoitilesizing_layer():
+    df = pd.DataFrame({'Footprint WKT': [box(-158, 21.2, -157.85, 21.5).wkt, box(-157.9, 21.2, -157.7, 21.5).wkt]})
+    tiles = [box(-157.96, 21.3, -157.91, 21.4), box(-157.89, 21.3, -157.86, 21.4), box(150, 21.3, 150.1, 21.4).wkt]
+    sizing = sensortools.gbdxaoi.aoiTileSizing(df, tiles=tiles)
+    assert list(sizing['Footprint Count']) == [1, 2, 0]
+    assert list(sizing['Coverage Percent'].round(6)) == [100., 100., 0.]
+    assert sizing.loc['2', 'WV03_Pan GB'] == 0
+
+
+def test_aoitilesizing_layer_order():
+    df = pd.DataFrame({'Footprint WKT': [box(-158, 21.2, -157.7, 21.5).wkt]})
+    # tiles alternate between UTM zones 4 and 56
+    tiles = [box(-157.96, 21.3, -157.91, 21.4), box(150, 21.3, 150.1, 21.4), box(-157.89, 21.3, -157.86, 21.4)]
+    sizing = sensortools.gbdxaoi.aoiTileSizing(df, tiles=tiles)
+    assert list(sizing.index) == ['0', '1', '2']
+    assert list(sizing['Footprint Count']) == [1, 0, 1]
+
+
+def test_aoitilesizing_shapefile(gbdxsearch_resultsdf, data_dir):
+    sizing = sensortools.gbdxaoi.aoiTileSizing(
+        gbdxsearch_resultsdf, tiles=os.path.join(data_dir, 'japan_urban.shp'), id_field='area_sqkm')
+    assert len(sizing) == 259
+    assert (sizing['Footprint Count'] == 0).all()
@@ -0,0 +1,48 @@
+from sensortools.query import SearchQuery, filterSearchResults
+import pandas as pd
+
+
+def test_searchquery_matches_pandas(gbdxsearch_resultsdf):
+    df = gbdxsearch_resultsdf
+    q = SearchQuery(df).sensor('WORLDVIEW03_VNIR').cloudCover(max=20).offNadir(max=25)
+    truth = df[(df['Sensor'] == 'WORLDVIEW03_VNIR') & (df['Cloud Cover'] <= 20) & (df['Off Nadir Angle'] <= 25)]
+    assert len(q) == len(truth)
+    assert sorted(q.results()['image_identifier']) == sorted(truth['image_identifier'])
+
+
+def test_searchquery_daterange(gbdxsearch_resultsdf):
+    df = gbdxsearch_resultsdf
+    results = SearchQuery(df).dateRange('2016-01-01', '2016-12-31').results()
+    dates = pd.to_datetime(df['Date'])
+    assert len(results) == ((dates >= '2016-01-01') & (dates <= '2016-12-31')).sum()
+    assert pd.to_datetime(results['Date']).is_monotonic_increasing
+
+
+def test_searchquery_unknown_sensor(gbdxsearch_resultsdf):
+    assert len(SearchQuery(gbdxsearch_resultsdf).sensor('WORLDVIEW02')) == 0
+
+
+def test_searchquery_shared_masks(gbdxsearch_resultsdf):
+    q = SearchQuery(gbdxsearch_resultsdf)
+    low_cloud = q.cloudCover(max=30)
+    a = low_cloud.sunElevation(min=40)
+    b = q.sunElevation(min=40).cloudCover(max=30)
+    assert (a.mask() == b.mask()).all()
+    assert a.mask() is b.mask()
+    assert len(low_cloud & q.sunElevation(min=40)) == len(a)
+
+
+def test_filtersearchresults(gbdxsearch_resultsdf):
+    # a low cloud, high overlap row from another sensor must be filtered out
+    other = gbdxsearch_resultsdf.iloc[[0]].copy()
+    other['Sensor'] = 'WORLDVIEW02'
+    other['image_identifier'] = 'wv02-image'
+    other['Cloud Cover'] = 0
+    other['Footprint AOI Inter Percent'] = 100.
+    df = pd.concat([gbdxsearch_resultsdf, other])
+    results = filterSearchResults(df, sensor='WORLDVIEW03_VNIR', max_cloud=10, min_aoi_overlap=50)
+    truth = df[(df['Sensor'] == 'WORLDVIEW03_VNIR') & (df['Cloud Cover'] <= 10) &
+               (df['Footprint AOI Inter Percent'] >= 50)]
+    assert len(results) == len(truth)
+    assert 'wv02-image' not in set(results['image_identifier'])
+    assert sorted(results['image_identifier']) == sorted(truth['image_identifier'])
@@ -0,0 +1,63 @@
+import sensortools.temporal
+from sensortools.decorators import InputError
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def acquisitions():
+    return pd.DataFrame({
+        'catalog_id': ['A', 'A', 'B', 'C', 'D', 'E', 'F'],
+        'Sensor': ['WV03', 'WV03', 'WV03', 'WV03', 'WV03', 'WV02', 'WV02'],
+        'Date': pd.to_datetime(['2018-01-01', '2018-01-01', '2018-01-03', '2018-01-13', '2018-01-14',
+                                '2018-01-01', '2018-03-02']),
+        'AOI Cloud Cover': [0, 100, 50, 100, 0, 0, 0],
+    })
+
+
+def test_revisitstats(acquisitions):
+    stats = sensortools.temporal.revisitStats(acquisitions, percentiles=(50, 100))
+    # A's image parts are one acquisition
+    assert stats.loc['WV03', 'Acquisitions'] == 4
+    assert stats.loc['WV03', 'P50 Gap (days)'] == pytest.approx(np.percentile([2, 10, 1], 50))
+    assert stats.loc['WV03', 'P100 Gap (days)'] == 10
+    assert stats.loc['WV03', 'Mean Gap (days)'] == pytest.approx(13 / 3.)
+    assert stats.loc['WV02', 'P50 Gap (days)'] == 60
+    assert stats.loc['WV03', 'Max Acquisitions per 30D'] == 4
+    assert stats.loc['WV02', 'Max Acquisitions per 30D'] == 1
+    assert stats.loc['WV02', 'First'] == pd.Timestamp('2018-01-01')
+    assert stats.loc['WV02', 'Last'] == pd.Timestamp('2018-03-02')
+
+
+def test_revisitstats_weighted(acquisitions):
+    stats = sensortools.temporal.revisitStats(acquisitions, weight='AOI Cloud Cover', percentiles=(50,))
+    # A keeps its cloud free part, C is fully clouded
+    assert stats.loc['WV03', 'Effective Acquisitions'] == pytest.approx(2.5)
+    # gap weights: 2 days (B, 0.5), 10 days (C, 0), 1 day (D, 1)
+    assert stats.loc['WV03', 'P50 Gap (days)'] == 1
+    assert stats.loc['WV03', 'Mean Gap (days)'] == pytest.approx(2. / 1.5)
+    assert stats.loc['WV03', 'Max Weighted Acquisitions per 30D'] == pytest.approx(2.5)
+
+
+def test_acquisitioncounts(acquisitions):
+    counts = sensortools.temporal.acquisitionCounts(acquisitions, window='5D')
+    wv3 = counts[counts['Sensor'] == 'WV03']
+    assert list(wv3['Acquisitions']) == [1, 2, 1, 2]
+    assert list(counts[counts['Sensor'] == 'WV02']['Acquisitions']) == [1, 1]
+
+
+def test_revisitstats_bad_weight(acquisitions):
+    with pytest.raises(InputError):
+        sensortools.temporal.revisitStats(acquisitions, weight='Cloud Cover')
+    with pytest.raises(InputError):
+        sensortools.temporal.revisitStats(acquisitions.drop(columns=['AOI Cloud Cover']), weight='AOI Cloud Cover')
+
+
+def test_revisitstats_null_catalog_ids(gbdxsearch_resultsdf):
+    df = gbdxsearch_resultsdf.copy()
+    df['catalog_id'] = None
+    # each row is keyed by its image identifier
+    assert sensortools.temporal.revisitStats(df)['Acquisitions'].sum() == df['image_identifier'].nunique()
+    df = df.drop(columns=['image_identifier'])
+    assert sensortools.temporal.revisitStats(df)['Acquisitions'].sum() == len(df)
@@ -0,0 +1,44 @@
+import sensortools.tools.raster as raster_tools
+from shapely.geometry import Polygon, box
+from shapely import affinity
+import shapely.vectorized
+import numpy as np
+
+
+def _truth(shp, origin, cell_size, shape):
+    r, c = np.mgrid[0:shape[0], 0:shape[1]]
+    x = origin[0] + (c + 0.5) * cell_size
+    y = origin[1] - (r + 0.5) * cell_size
+    return shapely.vectorized.contains(shp, x, y)
+
+
+def _full_mask(shp, origin, cell_size, shape):
+    full = np.zeros(shape, dtype=bool)
+    window, mask = raster_tools.polygon_window_mask(shp, origin, cell_size, shape)
+    if window is not None:
+        full[window] = mask
+    return full
+
+
+def test_grid_for_bounds():
+    origin, shape = raster_tools.grid_for_bounds((15, -5, 95, 42), 10.)
+    assert origin == (10., 50.)
+    assert shape == (6, 9)
+
+
+def test_polygon_window_mask_holes_and_parts():
+    shp = Polygon([(0, 0), (100, 30), (80, 100), (20, 80), (50, 50)], [[(60, 40), (70, 40), (70, 60)]])
+    shp = affinity.translate(shp.union(box(120, 0, 150, 20)), 0.371, 0.213)
+    origin, shape = raster_tools.grid_for_bounds((-10, -10, 160, 110), 3.)
+    assert (_full_mask(shp, origin, 3., shape) == _truth(shp, origin, 3., shape)).all()
+
+
+def test_polygon_window_mask_clipped():
+    shp = affinity.translate(Polygon([(0, 0), (100, 30), (80, 100), (20, 80)]), 0.371, 0.213)
+    origin, shape = (20., 60.), (10, 10)
+    assert (_full_mask(shp, origin, 5., shape) == _truth(shp, origin, 5., shape)).all()
+
+
+def test_polygon_window_mask_outside():
+    window, mask = raster_tools.polygon_window_mask(box(500, 500, 600, 600), (0., 100.), 10., (10, 10))
+    assert window is None and mask is None
@@ -1,7 +1,9 @@
 import sensortools.tools.spatial as spatial_tools
 from sensortools.decorators import InputError
-from shapely.geometry import Point
+from shapely.geometry import Point, Polygon, box
 from math import isclose
+import numpy as np
+import shapely.wkt
 from pyproj import Proj
 import pytest
 
@@ -27,6 +29,55 @@ def test_aoiArea_4326():
     assert isclose(spatial_tools.aoiArea(aoi_wkt), truth_area)
 
 
+def test_geodesicArea_matches_utm():
+    aoi_wkt = 'POLYGON ((-104.9513504743272 22.60684943190418, -104.951024727671 23.51018701498204, ' \
+              '-105 23.51019471509047, -105 22.60685680348743, -104.9513504743272 22.60684943190418))'
+    # UTM scale factor at the central meridian shrinks areas by ~0.08%
+    assert isclose(spatial_tools.geodesicArea(aoi_wkt), spatial_tools.aoiArea(aoi_wkt), rel_tol=1e-3)
+
+
+def test_geodesicArea_antimeridian():
+    aoi_wkt = 'POLYGON ((179 -1, -179 -1, -179 1, 179 1, 179 -1))'
+    assert isclose(spatial_tools.geodesicArea(aoi_wkt), spatial_tools.geodesicArea(box(-1, -1, 1, 1).wkt))
+
+
+def test_geodesicArea_continental():
+    # lon/lat box spanning ten UTM zones, compared against the authalic sphere
+    r = 6371.0072
+    truth_area = r ** 2 * np.radians(60) * (np.sin(np.radians(60)) - np.sin(np.radians(20)))
+    assert isclose(spatial_tools.geodesicArea(box(-120, 20, -60, 60).wkt), truth_area, rel_tol=5e-3)
+
+
+def test_aoiArea_geodesic_method():
+    aoi_wkt = 'POLYGON ((-104.9513504743272 22.60684943190418, -104.951024727671 23.51018701498204, ' \
+              '-105 23.51019471509047, -105 22.60685680348743, -104.9513504743272 22.60684943190418))'
+    assert isclose(spatial_tools.aoiArea(aoi_wkt, method='geodesic'), 500, rel_tol=1e-3)
+
+
+def test_setAreaMethod():
+    aoi_wkt = box(-105, 22.6, -104.95, 23.5).wkt
+    try:
+        spatial_tools.setAreaMethod('geodesic')
+        assert spatial_tools.aoiArea(aoi_wkt) == spatial_tools.geodesicArea(aoi_wkt)
+        assert spatial_tools.aoiArea(aoi_wkt, method='utm') != spatial_tools.geodesicArea(aoi_wkt)
+    finally:
+        spatial_tools.setAreaMethod('utm')
+
+
+def test_setAreaMethod_input_err():
+    with pytest.raises(InputError):
+        spatial_tools.setAreaMethod('planar')
+
+
+def test_aoiAreas_batch():
+    aois = [box(-105, 22.6, -104.95, 23.5).wkt,
+            box(-1, -1, 1, 1).difference(box(0, 0, .5, .5)).wkt,
+            'MULTIPOLYGON (((0 0, 1 0, 1 1, 0 0)), ((2 0, 3 0, 3 1, 2 0)))']
+    for method in ('utm', 'geodesic'):
+        areas = spatial_tools.aoiAreas(aois, method=method)
+        assert np.allclose(areas, [spatial_tools.aoiArea(a, method=method) for a in aois])
+
+
 def test_getUTMProj_north():
     madrid = 'POINT (-3.7038 40.4168)'
     truth_proj = Proj(proj='utm', zone=30, ellps='WGS84', hemisphere='north')
@@ -73,3 +124,76 @@ def test_getLLUTMProj_lon_bound_err():
     with pytest.raises(InputError):
         aoi = ['42', '500392']
         spatial_tools.getLLUTMProj(*aoi)
+
+
+def test_utmZones_batch():
+    lat = np.array([40.4168, -25.9692, 60.39, 78.22, 78., 78., 78.])
+    lon = np.array([-3.7038, 32.5732, 5.32, 15.65, 8., 25., 40.])
+    zones, hemispheres = spatial_tools.utmZones(lat, lon)
+    assert list(zones) == [30, 36, 32, 33, 31, 35, 37]
+    assert list(hemispheres) == ['north', 'south', 'north', 'north', 'north', 'north', 'north']
+
+
+def test_utmEPSG():
+    assert list(spatial_tools.utmEPSG([40.4168, -25.9692], [-3.7038, 32.5732])) == [32630, 32736]
+
+
+def test_utmZones_bound_err():
+    with pytest.raises(InputError):
+        spatial_tools.utmZones([10, 95], [0, 0])
+
+
+def test_utmZones_inputtype_err():
+    with pytest.raises(InputError):
+        spatial_tools.utmZones(['north'], [0])
+
+
+def test_simplifyGeometry():
+    # a dense circle, ~1 km radius
+    circle = Point(139.7, 35.7).buffer(0.01, resolution=256)
+    simplified, error_km2 = spatial_tools.simplifyGeometry(circle, 10.)
+    assert len(simplified.exterior.coords) < len(circle.exterior.coords)
+    assert simplified.is_valid
+    full, fast = spatial_tools.aoiArea(circle.wkt), spatial_tools.aoiArea(circle.wkt, tolerance=10.)
+    assert fast != full
+    assert abs(fast - full) <= error_km2
+    assert spatial_tools.simplifyGeometry(circle, None) == (circle, 0.)
+
+
+def test_parseFootprints_mixed():
+    wkts = ['MULTIPOLYGON(((-157.93 21.46, -157.76 21.48, -157.76 21.35, -157.93 21.46)))',
+            'POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0), (2 2, 2 4, 4 4, 4 2, 2 2))',
+            'POLYGON ((1 1, 2 1, 2 2, 1 1))']
+    lon, lat, offsets, geom_idx, holes = spatial_tools.parseFootprints(wkts)
+    # the complex polygon falls back to shapely but keeps its place
+    assert list(geom_idx) == [0, 1, 1, 2]
+    assert list(holes) == [False, False, True, False]
+    assert list(np.diff(offsets)) == [4, 5, 5, 4]
+    assert lon[0] == -157.93 and lat[-1] == 1.
+
+
+def test_footprintStats(gbdxsearch_resultsdf):
+    wkts = list(gbdxsearch_resultsdf['Footprint WKT'].iloc[:20]) + \
+        ['POLYGON ((10 10, 10.1 10, 10.1 10.1, 10 10.1, 10 10), (10.02 10.02, 10.02 10.04, 10.04 10.04, 10.04 10.02, 10.02 10.02))']
+    stats = spatial_tools.footprintStats(wkts)
+    shps = [shapely.wkt.loads(wkt) for wkt in wkts]
+    assert np.allclose(stats['Area (km2)'], [spatial_tools.aoiArea(wkt) for wkt in wkts], rtol=1e-9)
+    assert np.allclose(stats[['Centroid X', 'Centroid Y']], [(s.centroid.x, s.centroid.y) for s in shps])
+    assert np.allclose(stats[['Min X', 'Min Y', 'Max X', 'Max Y']], [s.bounds for s in shps])
+    assert (stats['UTM Zone'].iloc[:20] == 4).all()
+    geodesic = spatial_tools.footprintStats(wkts, method='geodesic')['Area (km2)']
+    assert np.allclose(geodesic, [spatial_tools.geodesicArea(wkt) for wkt in wkts])
+
+
+def test_simplifyGeometry_keeps_lobes():
+    # simplifying the top edge without preserving topology cuts the bump of
+    # the bottom edge off into a separate lobe
+    s = 0.001
+    shp = Polygon([(0, 0), (5 * s, 1.2 * s), (10 * s, 0), (10 * s, s), (5 * s, 1.3 * s), (0, s)])
+    tolerance = 0.35 * s * spatial_tools.METERS_PER_DEGREE
+    simplified, error_km2 = spatial_tools.simplifyGeometry(shp, tolerance)
+    assert simplified.is_valid
+    assert simplified.geom_type == 'Polygon'
+    full, fast = spatial_tools.aoiArea(shp.wkt), spatial_tools.aoiArea(simplified.wkt)
+    assert abs(full - fast) <= error_km2
+    assert spatial_tools.aoiArea(shp.wkt, tolerance=tolerance, return_error=True) == (fast, error_km2)